@@ -0,0 +1,330 @@
+import xml.etree.ElementTree as ET
+import hashlib
+import os
+import pickle
+import threading
+from typing import Union
+
+# bumped whenever the layout of a compiled configuration changes, older caches are then compiled again
+VERSION = 4
+
+class ConfigIndex():
+    # Compiles config.xml and button_config.xml into one validated index of plain dicts.
+    # The compiled index is cached on disk and only rebuilt when the content of either file changes,
+    # each configuration is kept pickled until it is first asked for.
+    def __init__(self, config_path: str = "config.xml", button_path: str = "button_config.xml", cache_path: str = ".config_cache.pickle", logger = None):
+        self.config_path = config_path
+        self.button_path = button_path
+        self.cache_path = cache_path
+        self.logger = logger
+        self.lock = threading.RLock()
+        # path -> (mtime, size) of the files the index was built from
+        self.stamps = {}
+        self.digests = {}
+        self.order = []
+        self.descriptions = {}
+        # config id -> pickled configuration, unpickled into configs on first use
+        self.blobs = {}
+        self.configs = {}
+        # config id -> digest of its <config> and <buttons> source, unchanged entries are not compiled again
+        self.sources = {}
+
+    def get_stamp(self, path: str) -> tuple[int, int]:
+        status = os.stat(path)
+        return (status.st_mtime_ns, status.st_size)
+
+    def get_digest(self, path: str) -> str:
+        with open(path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def refresh(self) -> bool:
+        # make sure the index matches the files, True when it had to be loaded or compiled again
+        with self.lock:
+            paths = (self.config_path, self.button_path)
+            stamps = {path:self.get_stamp(path) for path in paths}
+            if stamps == self.stamps:
+                return False
+            digests = {path:self.get_digest(path) for path in paths}
+            if digests == self.digests:
+                # touched but not changed
+                self.stamps = stamps
+                return False
+            if not self.load_cache(digests):
+                self.compile()
+                self.save_cache(digests)
+            self.stamps = stamps
+            self.digests = digests
+            return True
+
+    def load_cache(self, digests: dict[str, str]) -> bool:
+        try:
+            with open(self.cache_path, "rb") as file:
+                cache = pickle.load(file)
+        except Exception:
+            return False
+        if cache.get("version") != VERSION or cache.get("digests") != [digests[self.config_path], digests[self.button_path]]:
+            return False
+        self.order = cache["order"]
+        self.descriptions = cache["descriptions"]
+        self.blobs = cache["blobs"]
+        self.sources = cache["sources"]
+        self.configs = {}
+        if self.logger:
+            self.logger.debug("Configuration index loaded from %s."%self.cache_path)
+        return True
+
+    def save_cache(self, digests: dict[str, str]) -> None:
+        cache = {"version": VERSION, "digests": [digests[self.config_path], digests[self.button_path]], "order": self.order, "descriptions": self.descriptions, "blobs": self.blobs, "sources": self.sources}
+        try:
+            with open(self.cache_path + ".tmp", "wb") as file:
+                pickle.dump(cache, file, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+        except Exception as e:
+            # the index still works from memory
+            if self.logger:
+                self.logger.warning("Configuration cache not written: %s"%e.__repr__())
+
+    def compile(self) -> object:
+        if self.logger:
+            self.logger.debug("Compiling %s and %s."%(self.config_path, self.button_path))
+        button_elements = {i.get("id"):i for i in ET.parse(self.button_path).getroot().findall("./configurations/config")}
+        order = []
+        descriptions = {}
+        blobs = {}
+        sources = {}
+        errors = []
+        for i in ET.parse(self.config_path).getroot().findall("./configurations/config"):
+            config_id = i.get("id")
+            if config_id in descriptions:
+                errors.append("config %s: duplicated id"%config_id)
+            source = hashlib.sha256(ET.tostring(i) + (ET.tostring(button_elements[config_id]) if config_id in button_elements else b"")).hexdigest()
+            if self.sources.get(config_id) == source:
+                # unchanged since the last compilation
+                blobs[config_id] = self.blobs[config_id]
+                descriptions[config_id] = self.descriptions[config_id]
+            else:
+                if self.logger and self.sources:
+                    self.logger.debug("Compiling config %s."%config_id)
+                config = self.compile_config(i, [self.compile_button(j) for j in button_elements[config_id].findall("./buttons/button")] if config_id in button_elements else [])
+                config["digest"] = source
+                errors.extend(["config %s: %s"%(config_id, error) for error in self.validate(config)])
+                blobs[config_id] = pickle.dumps(config, protocol = pickle.HIGHEST_PROTOCOL)
+                descriptions[config_id] = config["description"]
+            order.append(config_id)
+            sources[config_id] = source
+        for config_id in button_elements:
+            if config_id not in descriptions:
+                errors.append("buttons of unknown config %s"%config_id)
+        if errors:
+            if self.logger:
+                for error in errors:
+                    self.logger.error("Configuration error: %s"%error)
+            raise Exception("Configuration error: %s"%"; ".join(errors))
+        # keep the unpickled configs of unchanged entries
+        self.configs = {config_id:self.configs[config_id] for config_id in self.configs if self.sources.get(config_id) == sources[config_id]}
+        self.order = order
+        self.descriptions = descriptions
+        self.blobs = blobs
+        self.sources = sources
+        return self
+
+    def compile_button(self, element: ET.Element) -> dict[str, object]:
+        return {"type": element.get("type"), "instrument": element.get("instrument"), "parameter": element.get("parameter"), "inverted": element.get("inverted") == "True", "script": element.get("script"), "text": element.get("text")}
+
+    def compile_parameters(self, element: Union[ET.Element, None]) -> Union[dict[str, dict[str, object]], None]:
+        # type is uint, int or bool, scale is the physical value of one LSB in unit,
+        # a parameter with parts is a value wider than a register spread over the listed fields from the most significant one
+        if element is None:
+            return None
+        parameters = {}
+        for j in element.findall("./parameter"):
+            parameters[j.get("name")] = {
+                "index": int(j.get("index")) if j.get("parts") is None else None,
+                "high": int(j.get("high")) if j.get("parts") is None else None,
+                "low": int(j.get("low")) if j.get("parts") is None else None,
+                "parts": j.get("parts").split() if j.get("parts") is not None else None,
+                "type": j.get("type", "uint"),
+                "signed": j.get("type") == "int" or j.get("signed") == "True",
+                "scale": float(j.get("scale")) if j.get("scale") is not None else None,
+                "unit": j.get("unit"),
+                "value": int(j.get("value")) if j.get("value") is not None else None,
+            }
+        return parameters
+
+    def compile_config(self, element: ET.Element, buttons: list[dict[str, object]]) -> dict[str, object]:
+        config = {
+            "id": element.get("id"),
+            "description": element.get("description"),
+            "platform": element.get("platform"),
+            "firmware": element.get("firmware"),
+            "comb_id": element.get("comb_id"),
+            "AXKU041_supported": element.get("AXKU041_supported") == "True",
+            "instruments": [],
+            "connections": [{"source": i.get("source"), "destination": i.get("destination")} for i in element.findall("./connections/connection")],
+            "frontends": {int(i.get("channel")):{"impedance": i.get("impedance"), "coupling": i.get("coupling"), "attenuation": i.get("attenuation")} for i in element.findall("./io_settings/input")},
+            "outputs": {int(i.get("channel")):{"gain": i.get("gain")} for i in element.findall("./io_settings/output")},
+            "buttons": buttons,
+            # purpose -> command name -> {"lane", "steps"}
+            "commands": {},
+        }
+        for i in element.findall("./instruments/instrument"):
+            bitstream = i.find("bitstream")
+            config["instruments"].append({
+                "type": i.get("type"),
+                "slot": int(i.get("slot")),
+                "purpose": i.get("purpose"),
+                "bitstream": bitstream.text if bitstream is not None else None,
+                # name -> {"index", "high", "low", "signed", "value"} for Moku and for AXKU041
+                "parameters": self.compile_parameters(i.find("parameters")),
+                "parameters_for_AXKU041": self.compile_parameters(i.find("parameters_for_AXKU041")),
+            })
+        for i in element.findall("./commands/command"):
+            config["commands"].setdefault(i.get("purpose"), {})[i.get("name")] = self.compile_command(i)
+        return config
+
+    def compile_command(self, element: ET.Element) -> dict[str, object]:
+        # steps run in order, set assigns a field, pulse drives a field to active and back to idle
+        # once the preceding sets have landed, wait holds the given seconds after everything before it was accepted
+        steps = []
+        for j in element:
+            step = {"action": j.tag, "instrument": j.get("instrument")}
+            match j.tag:
+                case "set":
+                    step.update({"parameter": j.get("parameter"), "value": int(j.get("value"))})
+                case "pulse":
+                    step.update({"parameter": j.get("parameter"), "active": int(j.get("active", "1")), "idle": int(j.get("idle", "0"))})
+                case "wait":
+                    step.update({"seconds": float(j.get("seconds"))})
+            steps.append(step)
+        return {"lane": element.get("lane", "control"), "steps": steps}
+
+    def validate(self, config: dict[str, object]) -> list[str]:
+        errors = []
+        slots = [i["slot"] for i in config["instruments"]]
+        for slot in set(slots):
+            if slot not in range(1, 5):
+                errors.append("slot %d out of range"%slot)
+            if slots.count(slot) > 1:
+                errors.append("slot %d used more than once"%slot)
+        purposes = {}
+        for i in config["instruments"]:
+            if i["type"] != "CloudCompile":
+                continue
+            if i["bitstream"] is None or i["parameters"] is None:
+                errors.append("slot %d: CloudCompile without bitstream or parameters"%i["slot"])
+                continue
+            for variant in ("parameters", "parameters_for_AXKU041"):
+                if i[variant] is not None:
+                    errors.extend(["slot %d %s: %s"%(i["slot"], variant, error) for error in self.validate_parameters(i[variant])])
+            for purpose in (("feedback", "turnkey") if i["purpose"] == "feedback and turnkey" else (i["purpose"],)):
+                purposes[purpose] = i
+        for button in config["buttons"]:
+            if button["instrument"] not in purposes:
+                errors.append("button \"%s\" refers to missing instrument %s"%(button["text"], button["instrument"]))
+            elif button["type"] == "switch" and button["parameter"] not in purposes[button["instrument"]]["parameters"]:
+                errors.append("button \"%s\" refers to missing parameter %s"%(button["text"], button["parameter"]))
+            elif button["type"] not in ("switch", "script"):
+                errors.append("button \"%s\" has unknown type %s"%(button["text"], button["type"]))
+        for purpose, commands in config["commands"].items():
+            for name, command in commands.items():
+                errors.extend(["command %s of %s: %s"%(name, purpose, error) for error in self.validate_command(purpose, command, purposes)])
+        return errors
+
+    def validate_command(self, purpose: str, command: dict[str, object], purposes: dict[str, dict[str, object]]) -> list[str]:
+        errors = []
+        if purpose not in purposes:
+            errors.append("missing instrument %s"%purpose)
+        if command["lane"] not in ("emergency", "control", "bulk"):
+            errors.append("unknown lane %s"%command["lane"])
+        for step in command["steps"]:
+            target = step["instrument"] or purpose
+            if step["action"] not in ("set", "pulse", "wait"):
+                errors.append("unknown step %s"%step["action"])
+            elif step["action"] == "wait":
+                if not step["seconds"] >= 0:
+                    errors.append("negative wait %s"%step["seconds"])
+            elif target not in purposes:
+                errors.append("%s refers to missing instrument %s"%(step["action"], target))
+            elif step["parameter"] not in purposes[target]["parameters"]:
+                errors.append("%s refers to missing parameter %s"%(step["action"], step["parameter"]))
+            else:
+                parameters = purposes[target]["parameters"]
+                parameter = parameters[step["parameter"]]
+                if parameter["parts"] is not None:
+                    width = sum([parameters[part]["high"] - parameters[part]["low"] + 1 for part in parameter["parts"]])
+                else:
+                    width = parameter["high"] - parameter["low"] + 1
+                for value in ([step["value"]] if step["action"] == "set" else [step["active"], step["idle"]]):
+                    if not -(1 << (width - 1)) <= value <= (1 << width) - 1:
+                        errors.append("%s value %d does not fit %d bits"%(step["parameter"], value, width))
+        return errors
+
+    def validate_parameters(self, parameters: dict[str, dict[str, object]]) -> list[str]:
+        errors = []
+        # control index -> {bit: parameter name}
+        occupied = {}
+        for name, parameter in parameters.items():
+            if parameter["type"] not in ("uint", "int", "bool"):
+                errors.append("%s has unknown type %s"%(name, parameter["type"]))
+            if parameter["scale"] is not None and not parameter["scale"] > 0:
+                errors.append("%s has invalid scale %s"%(name, parameter["scale"]))
+            if parameter["parts"] is not None:
+                if any([part not in parameters or parameters[part]["parts"] is not None for part in parameter["parts"]]):
+                    errors.append("%s is made of missing parts %s"%(name, " ".join(parameter["parts"])))
+                    continue
+                width = sum([parameters[part]["high"] - parameters[part]["low"] + 1 for part in parameter["parts"]])
+                if parameter["value"] is not None and not -(1 << (width - 1)) <= parameter["value"] <= (1 << width) - 1:
+                    errors.append("%s default %d does not fit %d bits"%(name, parameter["value"], width))
+                continue
+            if parameter["value"] is None:
+                errors.append("%s has no default"%name)
+                continue
+            if parameter["index"] not in range(16) or not 0 <= parameter["low"] <= parameter["high"] <= 31:
+                errors.append("%s has invalid bitfield %d[%d:%d]"%(name, parameter["index"], parameter["high"], parameter["low"]))
+                continue
+            bits = occupied.setdefault(parameter["index"], {})
+            for bit in range(parameter["low"], parameter["high"] + 1):
+                if bit in bits:
+                    errors.append("%s overlaps %s at control %d bit %d"%(name, bits[bit], parameter["index"], bit))
+                    break
+                bits[bit] = name
+            width = parameter["high"] - parameter["low"] + 1
+            if parameter["type"] == "bool" and width != 1:
+                errors.append("%s is a bool of %d bits"%(name, width))
+            # unsigned values use the whole field, negative ones are stored in two's complement
+            if not -(1 << (width - 1)) <= parameter["value"] <= (1 << width) - 1:
+                errors.append("%s default %d does not fit %d bits"%(name, parameter["value"], width))
+            elif parameter["signed"] and parameter["value"] > (1 << (width - 1)) - 1:
+                errors.append("%s default %d does not fit %d signed bits"%(name, parameter["value"], width))
+        return errors
+
+    def get_ids(self) -> list[str]:
+        self.refresh()
+        return list(self.order)
+
+    def get_descriptions(self) -> list[str]:
+        self.refresh()
+        return [self.descriptions[config_id] for config_id in self.order]
+
+    def get_config(self, config_id: str) -> dict[str, object]:
+        with self.lock:
+            self.refresh()
+            if config_id not in self.blobs:
+                raise Exception("Configuration not found.")
+            if config_id not in self.configs:
+                self.configs[config_id] = pickle.loads(self.blobs[config_id])
+            return self.configs[config_id]
+
+    def get_buttons(self, config_id: str) -> list[dict[str, object]]:
+        return self.get_config(config_id)["buttons"]
+
+index = None
+index_lock = threading.Lock()
+
+def get_index(logger = None) -> ConfigIndex:
+    # the index shared by the interfaces and MIM
+    global index
+    with index_lock:
+        if index is None:
+            index = ConfigIndex(logger = logger)
+        return index
@@ -1,32 +1,13 @@
+import numpy as np
+
 def upload_parameter_4SLA_IIR(instrument, mim):
-    filepath = '4SLA_IIR_parameters.txt'
-    f = open(filepath, 'r')
-    a = []
-    for i in range(17):
-        if i % 4 == 0 and i != 0:
-            a.append(int(f.readline().strip()))
-        else:
-            f.readline()  # skip the line
-    b = []
-    for i in range(17):
-        b.append(int(f.readline().strip()))
-    f.close()
-    for i in range(4):
-        mim.get_instrument(instrument).set_parameter("memory_address", i + 17)
-        mim.get_instrument(instrument).set_parameter("memory_data_high", a[i] // (2 ** 32))
-        mim.get_instrument(instrument).set_parameter("memory_data_low", a[i] % (2 ** 32))
-        mim.upload_control(instrument)
-        mim.get_instrument(instrument).set_parameter("write_enable", 1)
-        mim.upload_control(instrument)
-        mim.get_instrument(instrument).set_parameter("write_enable", 0)
-        mim.upload_control(instrument)
-    for i in range(17):
-        mim.get_instrument(instrument).set_parameter("memory_address", i)
-        mim.get_instrument(instrument).set_parameter("memory_data_high", b[i] // (2 ** 32))
-        mim.get_instrument(instrument).set_parameter("memory_data_low", b[i] % (2 ** 32))
-        mim.upload_control(instrument)
-        mim.get_instrument(instrument).set_parameter("write_enable", 1)
-        mim.upload_control(instrument)
-        mim.get_instrument(instrument).set_parameter("write_enable", 0)
-        mim.upload_control(instrument)
+    # every fourth of the first 17 lines goes to addresses 17 to 20, the next 17 lines to addresses 0 to 16
+    # only the used lines are converted, values of 2**63 and above are kept as their 64 bit pattern
+    with open('4SLA_IIR_parameters.txt') as file:
+        lines = [file.readline() for i in range(34)]
+    def words(rows):
+        return np.array([int(lines[i].split()[0]) & 0xFFFFFFFFFFFFFFFF for i in rows], dtype = np.uint64)
+    # returns once the coefficients are actually written
+    mim.load_memory(instrument, words(range(4, 17, 4)), 17)
+    mim.load_memory(instrument, words(range(17, 34)), 0)
     return
\ No newline at end of file
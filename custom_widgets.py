@@ -1,18 +1,18 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 
-from PIL import Image, ImageTk
-
 import numpy as np
 
 import threading
 import time
 import re
 
+import startup
+
 class ClampingKnob(tk.Canvas):
     def __init__(self, master = None, image_path = None, size = None, value_step = 1, step = 36, resistance = 1.5, lag = 0.5, value = 0, on_spin = None, max = np.inf, min = -np.inf, **kw):
         super().__init__(master, width = size + 2, height = size + 2, **kw)
-        self.image = Image.open(image_path)
+        self.image = startup.load("PIL.Image").open(image_path)
         self.size = size
         self.value_step = value_step
         self.step = step
@@ -36,7 +36,7 @@ class ClampingKnob(tk.Canvas):
 
     def draw(self):
         #self.delete("all")
-        self.image_tk = ImageTk.PhotoImage(self.image.rotate(-self.knob_angle))
+        self.image_tk = startup.load("PIL.ImageTk").PhotoImage(self.image.rotate(-self.knob_angle))
         self.create_image(self.size / 2 + 2, self.size / 2 + 2, image = self.image_tk, anchor = tk.CENTER)
 
     def hold(self, event):
@@ -79,7 +79,7 @@ class ClampingKnob(tk.Canvas):
 class UnclampingKnob(tk.Canvas):
     def __init__(self, master = None, image_path = None, size = None, value_step = 1, step = 36, resistance = 1.5, lag = 0.5, value = 0, on_spin = None, **kw):
         super().__init__(master, width = size + 2, height = size + 2, **kw)
-        self.image = Image.open(image_path)
+        self.image = startup.load("PIL.Image").open(image_path)
         self.size = size
         self.value_step = value_step
         self.step = step
@@ -100,7 +100,7 @@ class UnclampingKnob(tk.Canvas):
         return self.value
 
     def draw(self):
-        self.image_tk = ImageTk.PhotoImage(self.image.rotate(-self.knob_angle))
+        self.image_tk = startup.load("PIL.ImageTk").PhotoImage(self.image.rotate(-self.knob_angle))
         self.create_image(self.size / 2 + 2, self.size / 2 + 2, image = self.image_tk, anchor = tk.CENTER)
 
     def hold(self, event):
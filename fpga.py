@@ -1,598 +1,2225 @@
-import moku.instruments as instruments
-import numpy as np
-import time
-from typing import Union, NoReturn
-import requests
-import json
-import xml.etree.ElementTree as ET
-import threading
-import queue
-import re
-import sys
-
-# for AXKU041 connection
-sys.path.append("./AXKU041/python control/")
-import uart
-import bus
-import module_signal_router
-import module_moku_mim_wrapper
-import spi
-
-# for testing
-import matplotlib.pyplot as plt
-
-def set_bit(integer: int, index: int, bit: str) -> int:
-    binary = bin(integer)[2:].zfill(32)
-    return eval("0b" + binary[:31 - index] + bit + binary[32 - index:])
-
-def set_hex(integer: int, index: int, hexa: str) -> int:
-    hexadecimal = hex(integer)[2:].zfill(8)
-    return eval("0x" + hexadecimal[:7 - index] + hexa + hexadecimal[8 - index:])
-
-def bit_length(integer: int) -> int:
-    if integer > 0:
-        return int(np.log2(integer) + 1)
-    elif integer == 0 or integer == -1:
-        return 1
-    else:
-        return int(np.log2(-1 - integer) + 2)
-
-def convert_bits(integer: int, length: int) -> str:
-    if bit_length(integer) > length:
-        raise Exception("Value is too large to fit into the bit length!")
-    if integer >= 0:
-        return bin(integer)[2:].zfill(length)
-    else:
-        return bin(integer + 2 ** length)[2:].zfill(length)
-    
-
-class MCC():
-    def __init__(self, mcc: object, slot: int, controls: dict[int, int] = None, mode: str = "default"):
-        self.mcc = mcc
-        self.slot = slot
-        self.controls = {i:0 for i in range(16)}
-        self.mode = mode
-        if self.mode == "http":
-            assert self.mcc is None, "HTTP mode does not require an MCC object."
-
-        self.default_controls = self.controls.copy()
-    
-    def set_default_control(self) -> object:
-        self.set_control(self.default_controls)
-        return self
-    
-    def download_control(self) -> object:
-        if self.mode == "default":
-            if self.mcc is None:
-                pass
-            else:
-                try:
-                    self.controls = {index:value for index, value in zip(range(16), [self.mcc.get_control(i)[i] for i in range(16)])}
-                except Exception as e:
-                    raise Exception("Connection error: %s"%e.__repr__())
-        elif self.mode == "http":
-            try:
-                response = requests.get("http://192.168.73.1/api/v2/registers")
-                if response.status_code != 200:
-                    raise Exception("Status code: %s"%response.status_code)
-                for i in response.json():
-                    if i[0] == "instr" + str(self.slot - 1) and all([str(j) in i[1] for j in range(6, 22)]):
-                        self.controls = {index:i[1][str(index + 6)] for index in range(16)}
-                        break
-                else:
-                    self.controls = {index:0 for index in range(16)}
-            except Exception as e:
-                raise Exception("Connection error: %s"%e.__repr__())
-        elif self.mode == "AXKU041":
-            try:
-                for i in range(15, -1, -1):
-                    self.controls[i] = int.from_bytes(self.mcc.read(i + (self.slot - 1) * 16), "big")
-            except Exception as e:
-                raise Exception("Connection error: %s"%e.__repr__())
-        return self
-
-    def upload_control(self, controls: dict[int, int]) -> object:
-        if self.mode == "default":
-            try:
-                for i in range(15, -1, -1):
-                    self.mcc.set_control(i, controls[i])
-            except Exception as e:
-                raise Exception("Connection error: %s"%e.__repr__())
-        elif self.mode == "http":
-            post = "[[\"instr" + str(self.slot - 1) + "\", {"
-            for i in range(0, 16):
-                post = post + "\"" + str(i + 6) + "\":" + str(controls[i])
-                if i != 15:
-                    post = post + ","
-            post = post + "}]]"
-            try:
-                request = json.loads(post)
-                response = requests.post(url = "http://192.168.73.1/api/v2/registers", json = request)
-                if response.status_code != 200:
-                    raise Exception("Status code: %s"%response.status_code)
-            except Exception as e:
-                raise Exception("Connection error: %s"%e.__repr__())
-        elif self.mode == "AXKU041":
-            try:
-                for i in range(15, -1, -1):
-                    self.mcc.write(i + (self.slot - 1) * 16, controls[i])
-            except Exception as e:
-                raise Exception("Connection error: %s"%e.__repr__())
-        return self
-
-    def set_control(self, *arg) -> object:
-        if len(arg) == 1 and arg[0] is not None:
-            self.controls.update(arg[0])
-        elif len(arg) == 2:
-            self.controls[arg[0]] = arg[1]
-        return self
-
-    def get_control(self, i: int) -> int:
-        return self.controls[i]
-    
-    def set_bit(self, control: int, index: int, bit: str) -> object:
-        self.controls[control] = set_bit(self.get_control(control), index, bit)
-        return self
-        
-    def set_hex(self, control: int, index: int, hexa: str) -> object:
-        self.controls[control] = set_hex(self.get_control(control), index, hexa)
-        return self
-
-class Turnkey(MCC):
-    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default"):
-        super().__init__(mcc, slot, controls, mode)
-        self.default_parameters = parameters
-        self.mapping = mapping
-
-    def set_default_parameter(self) -> object:
-        for i in self.default_parameters:
-            self.set_parameter(i, self.default_parameters[i])
-
-    def set_parameter(self, name: str, value: int) -> object:
-        location = self.mapping[name]
-        bits = convert_bits(value, location["high"] - location["low"] + 1)
-        pointer = location["high"]
-        for i in bits:
-            self.set_bit(location["index"], pointer, i)
-            pointer = pointer - 1
-        return self
-    
-    def get_parameter(self, name: str) -> int:
-        location = self.mapping[name]
-        bits = bin(self.get_control(location["index"]))[2:].zfill(32)
-        return eval("0b" + bits[31 - location["high"]: 32 - location["low"]])
-
-class Feedback(MCC):
-    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default"):
-        super().__init__(mcc, slot, controls, mode)
-        self.default_parameters = parameters
-        self.mapping = mapping
-        self.waveform = []
-
-    def set_default_parameter(self) -> object:
-        for i in self.default_parameters:
-            self.set_parameter(i, self.default_parameters[i])
-    
-    def set_parameter(self, name: str, value: int) -> object:
-        location = self.mapping[name]
-        bits = convert_bits(value, location["high"] - location["low"] + 1)
-        pointer = location["high"]
-        for i in bits:
-            self.set_bit(location["index"], pointer, i)
-            pointer = pointer - 1
-        return self
-
-    def get_parameter(self, name: str) -> int:
-        location = self.mapping[name]
-        bits = bin(self.get_control(location["index"]))[2:].zfill(32)
-        return eval("0b" + bits[31 - location["high"]: 32 - location["low"]])
-    
-class MCC_Template(MCC):
-    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default"):
-        super().__init__(mcc, slot, controls, mode)
-        self.default_parameters = parameters
-        self.mapping = mapping
-
-    def set_default_parameter(self) -> object:
-        for i in self.default_parameters:
-            self.set_parameter(i, self.default_parameters[i])
-
-    def set_parameter(self, name: str, value: int) -> object:
-        location = self.mapping[name]
-        bits = convert_bits(value, location["high"] - location["low"] + 1)
-        pointer = location["high"]
-        for i in bits:
-            self.set_bit(location["index"], pointer, i)
-            pointer = pointer - 1
-        return self
-    
-    def get_parameter(self, name: str) -> int:
-        location = self.mapping[name]
-        bits = bin(self.get_control(location["index"]))[2:].zfill(32)
-        return eval("0b" + bits[31 - location["high"]: 32 - location["low"]])
-
-class MIM():
-    def __init__(self, ip, config_id = "1", logger = None):
-        self.logger = logger
-        self.config_id = config_id
-        if re.match(r"^([0-9]{1,3}\.){3}[0-9]{1,3}$", ip) or re.match(r"^\[([0-9a-fA-F]{0,4}:){5,7}[0-9a-fA-F]{0,4}\]$", ip):
-            self.ip = ip
-            self.mode = "default"
-            # claim ownership at class initialization under default mode
-            self.mim = instruments.MultiInstrument(self.ip, force_connect = True, platform_id = 4)
-        elif ip == "local":
-            self.ip = "192.168.73.1"
-            self.mode = "http"
-            # verify the connection by sending a request
-            response = requests.get("http://192.168.73.1/api/v2/registers")
-            if response.status_code != 200:
-                if self.logger:
-                    self.logger.error("Connection error: %s"%response.status_code)
-                raise Exception("Status Code: %s"%response.status_code)
-        elif re.match(r"^COM[0-9]{1,2}$", ip):
-            # Serial connection indicates instead of Moku:Pro,
-            # the custom FPGA design running on AXKU041 is used.
-            self.ip = ip
-            self.mode = "AXKU041"
-            try:
-                self.serial = uart.MySerial(self.ip, baudrate = 19200, parity = "E", timeout = 0.5)
-                self.bus = bus.Bus(self.serial)
-                self.module_mim = module_moku_mim_wrapper.ModuleMokuMIMWrapper(self.bus, self.config_id)
-                self.module_router = module_signal_router.ModuleSignalRouter(self.bus)
-                # Set up the routing to let the MIM module directly connect to design's interface
-                self.module_router.set_routing(0, 10)
-                self.module_router.set_routing(1, 11)
-                self.module_router.set_routing(2, 12)
-                self.module_router.set_routing(3, 13)
-                self.module_router.set_routing(6, 6)
-                self.module_router.set_routing(7, 7)
-                self.module_router.set_routing(8, 8)
-                self.module_router.set_routing(9, 9)
-                self.module_router.upload()
-                self.sp = spi.Spi(self.serial)
-                self.sp.write("adc1", 3, 3, b"\x00\x14\x41")
-                self.sp.write("adc1", 3, 3, b"\x00\x17\x06")
-                self.sp.write("adc1", 3, 3, b"\x00\xFF\x01")
-                self.sp.write("adc2", 3, 3, b"\x00\x14\x41")
-                self.sp.write("adc2", 3, 3, b"\x00\x17\x06")
-                self.sp.write("adc2", 3, 3, b"\x00\xFF\x01")
-            except Exception as e:
-                if self.logger:
-                    self.logger.error("Connection error: %s"%e.__repr__())
-                raise Exception("Connection error: %s"%e.__repr__())
-        else:
-            if self.logger:
-                self.logger.error("Invalid IP address.")
-            raise Exception("Invalid IP address.")
-        if self.logger:
-            self.logger.debug("MIM Created.")
-        self.instruments = {1:None, 2:None, 3:None, 4:None}
-        self.purposes = {}
-        self.config = None
-        if self.mode == "default" or self.mode == "http":
-            self.bitstreams = {1:None, 2:None, 3:None, 4:None}
-            self.other_instruments = {1:None, 2:None, 3:None, 4:None}
-            self.connections = []
-            self.frontends = {}
-            self.outputs = {}
-        
-        self.uploading_queue = queue.Queue() 
-        self.data_uploading_queue = queue.Queue() # only allows one queueing at a time
-        self.uploader = threading.Thread(target = self.uploader_function, args = (), daemon = True)
-        self.uploader.start()
-
-    def get_slot(self, type: str) -> Union[int, None]:
-        if type in self.purposes:
-            return self.purposes[type]
-        return None
-
-    def get_instrument(self, arg: Union[int, str, None]) -> Union[Turnkey, Feedback, None]:
-        if type(arg) == int:
-            return self.instruments[arg]
-        elif type(arg) == str:
-            return self.get_instrument(self.get_slot(arg))
-        return None
-
-    def parse_config(self) -> object:
-        # parse config from xml
-        if self.logger:
-            self.logger.debug("Parsing configuration.")
-        root = ET.parse("config.xml").getroot()
-        for i in root.findall("./configurations/config"):
-            if i.get("id") == self.config_id:
-                self.config = i
-                break
-        else:
-            raise Exception("Configuration not found.")
-        if self.logger:
-            if self.mode == "default" or self.mode == "http":
-                if self.config.get("platform") and self.config.get("firmware") and self.config.get("comb_id"):
-                    self.logger.debug("Configuration found, working on %s firmware version %s with comb No.%s. %s"%(self.config.get("platform"), self.config.get("firmware"), self.config.get("comb_id"), self.config.get("description")))
-                else:
-                    # a miscellanous configuration
-                    self.logger.debug("Configuration found, working with %s."%self.config.get("description"))
-            elif self.mode == "AXKU041":
-                # Verify if the configuration is supported in the design
-                if self.config.get("AXKU041_supported") == "True":
-                    self.logger.debug("Configuration found, working on AXKU041. %s"%self.config.get("description"))
-                else:
-                    raise Exception("The chosen configuration is not supported on AXKU041.")
-        
-        # set up instruments
-        self.instruments = {1:None, 2:None, 3:None, 4:None}
-        self.purposes = {}
-        if self.mode == "default" or self.mode == "http":
-            self.bitstreams = {1:None, 2:None, 3:None, 4:None}
-            self.other_instruments = {1:None, 2:None, 3:None, 4:None}
-        for i in self.config.findall("./instruments/instrument"):
-            match i.get("type"):
-                case "CloudCompile":
-                    slot = int(i.get("slot"))
-                    mapping = {j.get("name"):{"index": int(j.get("index")), "high": int(j.get("high")), "low": int(j.get("low"))} for j in i.findall("./parameters/parameter")}
-                    if self.mode == "default" or self.mode == "http":
-                        parameters = {j.get("name"):int(j.get("value")) for j in i.findall("./parameters/parameter")}
-                        mcc_object = None
-                        self.bitstreams[slot] = "./bitstreams/" + i.find("bitstream").text + ".tar.gz"
-                    elif self.mode == "AXKU041":
-                        parameters = {j.get("name"):int(j.get("value")) for j in i.findall("./parameters_for_AXKU041/parameter")}
-                        mcc_object = self.module_mim
-                    match i.get("purpose"):
-                        case "turnkey":
-                            if self.logger:
-                                self.logger.debug("Creating turnkey.")
-                            self.instruments[slot] = Turnkey(mcc_object, slot, parameters, mapping, {}, self.mode)
-                            self.purposes["turnkey"] = slot
-                        case "feedback":
-                            if self.logger:
-                                self.logger.debug("Creating feedback.")
-                            self.instruments[slot] = Feedback(mcc_object, slot, parameters, mapping, {}, self.mode)
-                            self.purposes["feedback"] = slot
-                        case "feedback and turnkey":
-                            if self.logger:
-                                self.logger.debug("Creating feedback and turnkey.")
-                            self.instruments[slot] = Feedback(mcc_object, slot, parameters, mapping, {}, self.mode)
-                            self.purposes["feedback"] = slot
-                            self.purposes["turnkey"] = slot
-                        case _:
-                            if self.logger:
-                                self.logger.debug("Unregistered MCC purpose.")
-                            self.instruments[slot] = MCC_Template(mcc_object, slot, parameters, mapping, {}, self.mode)
-                            self.purposes[i.get("purpose")] = slot
-                case _:
-                    if self.mode == "default" or self.mode == "http":
-                        if self.logger:
-                            self.logger.debug("Creating %s."%i.get("type"))
-                        slot = int(i.get("slot"))
-                        self.other_instruments[slot] = eval("instruments.%s"%i.get("type"))
-                    elif self.mode == "AXKU041":
-                        if self.logger:
-                            self.logger.debug("Skipping the creation of %s."%i.get("type"))
-
-        if self.mode == "default" or self.mode == "http":
-            # set up connections, frontends and outputs
-            if self.logger:
-                self.logger.debug("Setting connections.")
-            self.connections = []
-            for i in self.config.findall("./connections/connection"):
-                self.connections.append({"source": i.get("source"), "destination": i.get("destination")})
-
-            if self.logger:
-                self.logger.debug("Setting frontends and outputs.")
-            self.frontends = {}
-            self.outputs = {}
-            for i in self.config.findall("./io_settings/input"):
-                self.frontends[int(i.get("channel"))] = {"impedance": i.get("impedance"), "coupling": i.get("coupling"), "attenuation": i.get("attenuation")}
-            for i in self.config.findall("./io_settings/output"):
-                self.outputs[int(i.get("channel"))] = {"gain": i.get("gain")}
-        return self
-
-    def upload_config(self) -> object:
-        if self.logger:
-            self.logger.debug("Uploading configuration.")
-        if self.mode == "http":
-            # claim ownership at uploading function under http mode
-            self.mim = instruments.MultiInstrument(self.ip, force_connect = True, platform_id = 4)
-        if self.mode == "default" or self.mode == "http":
-            for i in range(1, 5):
-                if self.bitstreams[i]:
-                    self.instruments[i].mcc = self.mim.set_instrument(i, instruments.CloudCompile, bitstream = self.bitstreams[i])
-            for i in self.other_instruments:
-                if self.other_instruments[i]:
-                    self.instruments[i] = self.mim.set_instrument(i, self.other_instruments[i])
-            self.mim.set_connections(self.connections)
-            for i in self.frontends:
-                self.mim.set_frontend(i, self.frontends[i]["impedance"], self.frontends[i]["coupling"], self.frontends[i]["attenuation"])
-            for i in self.outputs:
-                self.mim.set_output(i, self.outputs[i]["gain"])
-        elif self.mode == "AXKU041":
-            self.module_mim.set_config(self.config_id)
-            # Refresh the module
-            self.module_mim.reset()
-            # Set the module to the specified configuration
-            self.module_mim.enable()
-            self.module_mim.upload()
-        return self
-
-    def upload_parameter(self) -> object:
-        for purpose in self.purposes:
-            self.get_instrument(purpose).set_default_parameter()
-            self.upload_control(purpose)
-        return self
-
-    def initialize(self) -> object:
-        if self.logger:
-            self.logger.info("Initializing MIM.")
-        self.parse_config()
-        self.upload_config()
-        self.upload_parameter()
-        return self
-    
-    def sync_download(self) -> object:
-        if self.logger:
-            self.logger.info("Synchronizing local parameters.")
-        for purpose in self.purposes:
-            self.get_instrument(purpose).download_control()
-        return self
-
-    def sync_upload(self) -> object:
-        if self.logger:
-            self.logger.info("Synchronizing remote parameters.")
-        for purpose in self.purposes:
-            self.get_instrument(purpose).upload_control()
-        return self
-    
-    def upload_control(self, purpose: str) -> object:
-        if self.logger:
-            self.logger.debug("Queued control for %s."%purpose)
-        instrument = self.get_instrument(purpose)
-        self.uploading_queue.put((instrument, instrument.controls.copy()))
-
-    def upload_data(self, purpose: str) -> str:
-        if self.data_uploading_queue.empty():
-            if self.logger:
-                self.logger.debug("Queued data for %s."%purpose)
-            instrument = self.get_instrument(purpose)
-            self.data_uploading_queue.put((instrument, instrument.controls.copy()))
-            return "queued"
-        if self.logger:
-            self.logger.debug("Data uploading queue is busy.")
-        return "rejected"
-    
-    def uploader_function(self) -> NoReturn:
-        while True:
-            time.sleep(0.05)
-            if not self.uploading_queue.empty():
-                if self.logger:
-                    self.logger.debug("Uploading control.")
-                self.upload(self.uploading_queue.get())
-            if not self.data_uploading_queue.empty():
-                if self.logger:
-                    self.logger.debug("Uploading data.")
-                self.upload(self.data_uploading_queue.get())
-
-    def upload(self, package: tuple[object, dict[int, int]]) -> object:
-        package[0].upload_control(package[1])
-        return self
-
-    # intercept all mcc commands
-    def command(self, purpose: str, operation: str) -> object:
-        if self.logger:
-            self.logger.debug("Implementing operation \"%s\" for %s."%(operation, purpose))
-        match purpose:
-            case "turnkey":
-                instrument = self.get_instrument("turnkey")
-                match operation:
-                    case "run":
-                        instrument.set_parameter("mode", 0)
-                        instrument.set_parameter("Reset", 0)
-                        instrument.set_parameter("manual_offset", 0)
-                        self.upload_control("turnkey")
-                    case "stop":
-                        instrument.set_parameter("Reset", 1)
-                        self.upload_control("turnkey")
-                    case "sweep":
-                        instrument.set_parameter("mode", 1)
-                        instrument.set_parameter("Reset", 0)
-                        instrument.set_parameter("manual_offset", 0)
-                        self.upload_control("turnkey")
-                    case "power_lock_on":
-                        instrument.set_parameter("PID_lock", 0)
-                        self.upload_control("turnkey")
-                    case "power_lock_off":
-                        instrument.set_parameter("PID_lock", 1)
-                        self.upload_control("turnkey")
-                    case _:
-                        raise Exception("Unknown operation.")
-            case "feedback":
-                instrument = self.get_instrument("feedback")
-                match operation:
-                    case "LO_on":
-                        instrument.set_parameter("LO_Reset", 0)
-                        self.upload_control("feedback")
-                    case "LO_off":
-                        instrument.set_parameter("LO_Reset", 1)
-                        self.upload_control("feedback")
-                    case "fast_PID_on":
-                        instrument.set_parameter("fast_PID_Reset", 0)
-                        self.upload_control("feedback")
-                    case "fast_PID_off":
-                        instrument.set_parameter("fast_PID_Reset", 1)
-                        self.upload_control("feedback")
-                    case "slow_PID_on":
-                        instrument.set_parameter("slow_PID_Reset", 0)
-                        self.upload_control("feedback")
-                    case "slow_PID_off":
-                        instrument.set_parameter("slow_PID_Reset", 1)
-                        self.upload_control("feedback")
-                    case "auto_match_on":
-                        instrument.set_parameter("enable_auto_match", 0)
-                        self.upload_control("feedback")
-                    case "auto_match_off":
-                        instrument.set_parameter("enable_auto_match", 1)
-                        self.upload_control("feedback")
-                    case "launch_auto_match":
-                        instrument.set_parameter("initiate_auto_match", 1)
-                        self.upload_control("feedback")
-                        instrument.set_parameter("initiate_auto_match", 0)
-                        self.upload_control("feedback")
-                        instrument.set_parameter("initiate_auto_match", 1)
-                        self.upload_control("feedback")
-                    case "launch_frequency_control":
-                        instrument.set_parameter("initiate", 1)
-                        self.upload_control("feedback")
-                        instrument.set_parameter("initiate", 0)
-                        self.upload_control("feedback")
-                        instrument.set_parameter("initiate", 1)
-                        self.upload_control("feedback")
-                    case "upload_waveform":
-                        instrument.set_parameter("segments_enabled", len(instrument.waveform) - 1)
-                        for i in range(len(instrument.waveform)):
-                            instrument.set_parameter("set_sign", instrument.waveform[i]["sign"])
-                            instrument.set_parameter("set_x", instrument.waveform[i]["x"])
-                            instrument.set_parameter("set_y", instrument.waveform[i]["y"])
-                            instrument.set_parameter("set_slope", instrument.waveform[i]["slope"])
-                            instrument.set_parameter("set_address", i)
-                            instrument.set_parameter("set", 1)
-                            self.upload_control("feedback")
-                            instrument.set_parameter("set", 0)
-                            self.upload_control("feedback")
-                            instrument.set_parameter("set", 1)
-                            self.upload_control("feedback")
-                    case _:
-                        raise Exception("Unknown operation.")
-            case _:
-                raise Exception("Unknown purpose.")
-        return self
-
-
-    def disconnect(self) -> object:
-        if self.logger:
-            self.logger.info("Disconnecting MIM.")
-        if self.mode == "default" or self.mode == "http":
-            self.mim.relinquish_ownership()
-        elif self.mode == "AXKU041":
-            self.serial.close()
-        return self
-    
-    def get_waveform(self, frames: int = 50, delay: float = 0.000) -> list[float]:
-        if self.logger:
-            self.logger.info("Getting waveform from MIM.")
-        result = []
-        for i in range(frames):
-            result = self.osc.get_data()["ch1"] + result
-            time.sleep(delay)
-        return result
-
-def test(mim, N, delay):
-    fig, ax = plt.subplots()
-    x = np.linspace(0, N, 1024 * N)
-    y = mim.get_waveform(N, delay)
-    ax.plot(x, y)
-    plt.show()
-
-if __name__ == "__main__":
-    mim = MIM("192.168.73.1")
-    mim.initialize()
-    
-    # testing
+import numpy as np
+import time
+from typing import Union, NoReturn
+import threading
+import collections
+import collections.abc
+import array
+import concurrent.futures
+import re
+import sys
+import hashlib
+import os
+
+import config_index
+import startup
+import pipelined_bus
+
+# backends are imported by the mode that needs them, see load_moku, load_requests and load_AXKU041
+instruments = None
+requests = None
+uart = None
+bus = None
+module_signal_router = None
+module_moku_mim_wrapper = None
+spi = None
+
+def load_moku() -> None:
+    global instruments
+    instruments = startup.load("moku.instruments")
+
+def load_requests() -> None:
+    global requests
+    requests = startup.load("requests")
+
+def load_AXKU041() -> None:
+    global uart, bus, module_signal_router, module_moku_mim_wrapper, spi
+    if "./AXKU041/python control/" not in sys.path:
+        sys.path.append("./AXKU041/python control/")
+    uart = startup.load("uart")
+    bus = startup.load("bus")
+    module_signal_router = startup.load("module_signal_router")
+    module_moku_mim_wrapper = startup.load("module_moku_mim_wrapper")
+    spi = startup.load("spi")
+
+def set_bit(integer: int, index: int, bit: str) -> int:
+    return (integer & ~(1 << index)) | (int(bit) << index)
+
+def set_hex(integer: int, index: int, hexa: str) -> int:
+    return (integer & ~(0xF << (index * 4))) | (int(hexa, 16) << (index * 4))
+
+def bit_length(integer: int) -> int:
+    if integer > 0:
+        return integer.bit_length()
+    elif integer == 0 or integer == -1:
+        return 1
+    else:
+        return (-1 - integer).bit_length() + 1
+
+def convert_bits(integer: int, length: int) -> str:
+    if bit_length(integer) > length:
+        raise Exception("Value is too large to fit into the bit length!")
+    if integer >= 0:
+        return bin(integer)[2:].zfill(length)
+    else:
+        return bin(integer + 2 ** length)[2:].zfill(length)
+
+class Field():
+    # a <parameter index high low> entry compiled into masks and shifts
+    # scale is the physical value of one LSB in unit, None for plain integers
+    def __init__(self, index: int, high: int, low: int, signed: bool = False, scale: float = None, unit: str = None):
+        self.index = index
+        self.high = high
+        self.low = low
+        self.signed = signed
+        self.scale = scale
+        self.unit = unit
+        self.width = high - low + 1
+        self.shift = low
+        self.mask = ((1 << self.width) - 1) << low
+        self.keep = 0xFFFFFFFF ^ self.mask
+        self.sign_bit = 1 << (self.width - 1)
+        # like convert_bits, both two's complement and unsigned values are accepted
+        self.min = -(1 << (self.width - 1))
+        self.max = (1 << self.width) - 1
+
+    def encode(self, value: int) -> int:
+        value = int(value)
+        if value < self.min or value > self.max:
+            raise Exception("Value is too large to fit into the bit length!")
+        return (value << self.shift) & self.mask
+
+    def decode(self, control: int) -> int:
+        value = (control & self.mask) >> self.shift
+        if self.signed and value & self.sign_bit:
+            value = value - (1 << self.width)
+        return value
+
+class CompositeField():
+    # a <parameter parts> entry, a value wider than one register spread over its parts from the most significant one
+    def __init__(self, parts: list[Field], signed: bool = False, scale: float = None, unit: str = None):
+        self.parts = parts
+        self.signed = signed
+        self.scale = scale
+        self.unit = unit
+        self.width = sum([part.width for part in parts])
+        self.sign_bit = 1 << (self.width - 1)
+        self.min = -(1 << (self.width - 1))
+        self.max = (1 << self.width) - 1
+
+    def split(self, value: int) -> list[int]:
+        value = int(value)
+        if value < self.min or value > self.max:
+            raise Exception("Value is too large to fit into the bit length!")
+        value = value & self.max
+        result = []
+        for part in reversed(self.parts):
+            result.insert(0, value & ((1 << part.width) - 1))
+            value = value >> part.width
+        return result
+
+    def join(self, controls: dict[int, int]) -> int:
+        value = 0
+        for part in self.parts:
+            value = (value << part.width) | ((controls[part.index] & part.mask) >> part.shift)
+        if self.signed and value & self.sign_bit:
+            value = value - (1 << self.width)
+        return value
+
+def compile_mapping(parameters: dict[str, dict[str, object]]) -> tuple[dict[str, dict[str, object]], dict[str, int]]:
+    # splits compiled <parameter> entries of config_index into the mapping and the defaults of an instrument
+    mapping = {name:{key:value for key, value in entry.items() if key != "value"} for name, entry in parameters.items()}
+    defaults = {name:entry["value"] for name, entry in parameters.items() if entry["value"] is not None}
+    return mapping, defaults
+
+class Codec():
+    def __init__(self, mapping: dict[str, dict[str, object]]):
+        self.fields = {name:Field(location["index"], location["high"], location["low"], location.get("signed", False), location.get("scale"), location.get("unit")) for name, location in mapping.items() if not location.get("parts")}
+        self.composites = {name:CompositeField([self.fields[part] for part in location["parts"]], location.get("signed", False), location.get("scale"), location.get("unit")) for name, location in mapping.items() if location.get("parts")}
+
+    def get_field(self, name: str) -> Union[Field, CompositeField]:
+        if name in self.composites:
+            return self.composites[name]
+        return self.fields[name]
+
+    def set_parameter(self, controls: dict[int, int], name: str, value: int) -> dict[int, int]:
+        if name in self.composites:
+            return self.set_parameters(controls, {name: value})
+        field = self.fields[name]
+        controls[field.index] = (controls[field.index] & field.keep) | field.encode(value)
+        return controls
+
+    def get_parameter(self, controls: dict[int, int], name: str) -> int:
+        if name in self.composites:
+            return self.composites[name].join(controls)
+        field = self.fields[name]
+        return field.decode(controls[field.index])
+
+    def set_parameters(self, controls: dict[int, int], parameters: dict[str, int]) -> dict[int, int]:
+        return self.apply(controls, *self.masks(parameters))
+
+    def masks(self, parameters: dict[str, int]) -> tuple[dict[int, int], dict[int, int]]:
+        # merge the fields of each register first so that every register is written once,
+        # keep holds the bits left untouched and bits the new content of each written register
+        keep = {}
+        bits = {}
+        for name, value in parameters.items():
+            if name in self.composites:
+                pieces = zip(self.composites[name].parts, self.composites[name].split(value))
+            else:
+                pieces = [(self.fields[name], value)]
+            for field, piece in pieces:
+                keep[field.index] = keep.get(field.index, 0xFFFFFFFF) & field.keep
+                bits[field.index] = (bits.get(field.index, 0) & field.keep) | field.encode(piece)
+        return keep, bits
+
+    def apply(self, controls: dict[int, int], keep: dict[int, int], bits: dict[int, int]) -> dict[int, int]:
+        for index in keep:
+            controls[index] = (controls[index] & keep[index]) | bits[index]
+        return controls
+
+    def get_parameters(self, controls: dict[int, int], names: list[str]) -> dict[str, int]:
+        return {name:self.get_parameter(controls, name) for name in names}
+
+    def to_raw(self, name: str, values: object) -> np.ndarray:
+        # physical values to register integers, one array in and one out
+        field = self.get_field(name)
+        dtype = np.uint64 if field.width == 64 and not field.signed else np.int64
+        if field.scale is None:
+            return self.to_integers(name, values).view(dtype)
+        values = np.rint(np.asarray(values, dtype = float) / field.scale)
+        # checked before the cast, which would wrap silently
+        if np.any(values < field.min) or np.any(values > field.max):
+            raise Exception("Value of %s is too large to fit into the bit length!"%name)
+        return values.astype(dtype)
+
+    def to_integers(self, name: str, values: object) -> np.ndarray:
+        # integers of a parameter to the two's complement bits of the field in uint64, range checked like Field.encode
+        field = self.get_field(name)
+        if not isinstance(values, np.ndarray):
+            array = np.asarray(values)
+            if array.dtype.kind in "fO":
+                # Python integers beyond int64 turn into float64 or object there, take them one by one to keep every bit
+                exact = np.asarray(values, dtype = object)
+                if all([isinstance(value, (int, np.integer)) for value in exact.ravel()]):
+                    if any([int(value) < field.min or int(value) > field.max for value in exact.ravel()]):
+                        raise Exception("Value of %s is too large to fit into the bit length!"%name)
+                    return np.array([int(value) & 0xFFFFFFFFFFFFFFFF for value in exact.ravel()], dtype = np.uint64).reshape(exact.shape)
+            values = array
+        if values.dtype.kind == "f":
+            # raw counts of a scaled field may come as whole floats, anything else has to be an integer
+            if field.scale is None or np.any(values != np.rint(values)):
+                raise Exception("Value of %s must be an integer."%name)
+            if np.any(values < max(field.min, -2 ** 63)) or np.any(values > min(field.max, 2 ** 63 - 1)):
+                raise Exception("Value of %s is too large to fit into the bit length!"%name)
+            values = values.astype(np.int64)
+        elif values.dtype.kind not in "iub":
+            raise Exception("Value of %s must be an integer."%name)
+        if np.any(values < field.min) or np.any(values > field.max):
+            raise Exception("Value of %s is too large to fit into the bit length!"%name)
+        # negative values wrap into two's complement
+        return values.astype(np.uint64) if values.dtype.kind in "ub" else values.astype(np.int64).astype(np.uint64)
+
+    def interpret(self, field: Union[Field, CompositeField], raw: object) -> np.ndarray:
+        # register integers, unsigned or two's complement, to the integers the field stands for
+        raw = np.asarray(raw)
+        if field.width < 64:
+            raw = raw.astype(np.int64) & field.max
+            if field.signed:
+                raw = np.where(raw & field.sign_bit, raw - (1 << field.width), raw)
+            return raw
+        return raw.astype(np.int64 if field.signed else np.uint64)
+
+    def from_raw(self, name: str, raw: object) -> np.ndarray:
+        # register integers to physical values
+        field = self.get_field(name)
+        raw = self.interpret(field, raw)
+        if field.scale is not None:
+            return raw * field.scale
+        return raw
+
+    def encode_array(self, controls: dict[int, int], parameters: dict[str, object]) -> np.ndarray:
+        # one register image per row, built from controls with every parameter array written into it
+        length = max([np.size(values) for values in parameters.values()] + [1])
+        images = np.tile(np.array([controls[index] for index in range(16)], dtype = np.uint64), (length, 1))
+        for name, values in parameters.items():
+            field = self.get_field(name)
+            values = np.broadcast_to(self.to_integers(name, values), (length,))
+            pieces = []
+            for part in reversed(field.parts if name in self.composites else [field]):
+                pieces.append((part, values & np.uint64((1 << part.width) - 1)))
+                values = values >> np.uint64(part.width)
+            for part, piece in pieces:
+                images[:, part.index] = (images[:, part.index] & np.uint64(part.keep)) | (piece << np.uint64(part.shift))
+        return images.astype(np.uint32)
+
+    def decode_array(self, images: np.ndarray, names: list[str]) -> dict[str, np.ndarray]:
+        images = np.asarray(images, dtype = np.uint64).reshape(-1, 16)
+        result = {}
+        for name in names:
+            field = self.get_field(name)
+            value = np.zeros(len(images), dtype = np.uint64)
+            for part in (field.parts if name in self.composites else [field]):
+                value = (value << np.uint64(part.width)) | ((images[:, part.index] & np.uint64(part.mask)) >> np.uint64(part.shift))
+            result[name] = self.interpret(field, value)
+        return result
+
+    def encode_quantities(self, controls: dict[int, int], quantities: dict[str, object]) -> np.ndarray:
+        return self.encode_array(controls, {name:self.to_raw(name, values) for name, values in quantities.items()})
+
+    def decode_quantities(self, images: np.ndarray, names: list[str]) -> dict[str, np.ndarray]:
+        return {name:self.from_raw(name, values) for name, values in self.decode_array(images, names).items()}
+
+class RegisterSnapshot(collections.abc.Mapping):
+    # one version of the 16 control registers, never changed once created
+    __slots__ = ("version", "words")
+
+    def __init__(self, version: int, words: array.array):
+        self.version = version
+        self.words = words
+
+    def __getitem__(self, index: int) -> int:
+        if type(index) is not int or not 0 <= index < 16:
+            raise KeyError(index)
+        return self.words[index]
+
+    def __iter__(self):
+        return iter(range(16))
+
+    def __len__(self) -> int:
+        return 16
+
+    def copy(self) -> object:
+        return self
+
+class RegisterImage():
+    # the control registers of an instrument as versioned snapshots
+    # readers take the current snapshot without locking, writers edit a copy of the words and
+    # commit it only if no other commit happened in between, retrying otherwise
+    def __init__(self):
+        self.state = RegisterSnapshot(0, array.array("I", [0] * 16))
+        # guards the compare and swap only
+        self.commit_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    def snapshot(self) -> RegisterSnapshot:
+        return self.state
+
+    def commit(self, base: RegisterSnapshot, words: array.array) -> Union[RegisterSnapshot, None]:
+        # the new snapshot, or None when base is no longer the current one
+        with self.commit_lock:
+            if self.state is not base:
+                return None
+            self.state = RegisterSnapshot(base.version + 1, words)
+            return self.state
+
+    def modify(self, function: callable) -> RegisterSnapshot:
+        # function edits the 16 words in place, it may run more than once under contention
+        while True:
+            base = self.state
+            words = array.array("I", base.words)
+            function(words)
+            committed = self.commit(base, words)
+            if committed is not None:
+                return committed
+
+    # dict-like access for the callers written against the former plain dict
+    def __getitem__(self, index: int) -> int:
+        return self.state[index]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        def write(words: array.array) -> None:
+            words[index] = value
+        self.modify(write)
+
+    def __iter__(self):
+        return iter(range(16))
+
+    def __len__(self) -> int:
+        return 16
+
+    def keys(self):
+        return range(16)
+
+    def items(self):
+        return self.state.items()
+
+    def copy(self) -> RegisterSnapshot:
+        return self.state
+
+    def update(self, controls: dict[int, int]) -> RegisterSnapshot:
+        # all registers of controls land in one commit
+        def write(words: array.array) -> None:
+            for index in controls:
+                words[index] = controls[index]
+        return self.modify(write)
+
+class HTTPTransport():
+    # keep-alive connection to the register endpoint used under http mode
+    # control registers 0 to 15 of a slot appear as keys "6" to "21"
+    REGISTER_KEYS = {str(index + 6) for index in range(16)}
+
+    def __init__(self, ip: str = "192.168.73.1", connect_timeout: float = 1.0, read_timeout: float = 3.0, pool_size: int = 4):
+        self.url = "http://%s/api/v2/registers"%ip
+        self.timeout = (connect_timeout, read_timeout)
+        load_requests()
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_connections = 1, pool_maxsize = pool_size))
+
+    def set_timeout(self, connect_timeout: float, read_timeout: float) -> object:
+        self.timeout = (connect_timeout, read_timeout)
+        return self
+
+    def get_registers(self) -> list:
+        response = self.session.get(self.url, timeout = self.timeout)
+        if response.status_code != 200:
+            raise Exception("Status code: %s"%response.status_code)
+        return response.json()
+
+    def get_snapshot(self) -> dict[int, dict[int, int]]:
+        # one GET indexed by slot, only complete register sets of CloudCompile slots are kept
+        snapshot = {}
+        for name, registers in self.get_registers():
+            if name.startswith("instr") and self.REGISTER_KEYS <= registers.keys():
+                snapshot[int(name[5:]) + 1] = {index:registers[str(index + 6)] for index in range(16)}
+        return snapshot
+
+    def post_registers(self, writes: dict[int, dict[int, int]]) -> object:
+        # writes maps slots to {control index: value}, all of them go out in one request
+        body = [["instr" + str(slot - 1), {str(i + 6):value for i, value in registers.items()}] for slot, registers in writes.items()]
+        response = self.session.post(self.url, json = body, timeout = self.timeout)
+        if response.status_code != 200:
+            raise Exception("Status code: %s"%response.status_code)
+        return self
+
+    def close(self) -> object:
+        self.session.close()
+        return self
+
+class MCC():
+    def __init__(self, mcc: object, slot: int, controls: dict[int, int] = None, mode: str = "default", transport: HTTPTransport = None):
+        self.mcc = mcc
+        self.slot = slot
+        self.controls = RegisterImage()
+        self.mode = mode
+        self.transport = transport
+        # pipelined request window of the AXKU041 bus, set by MIM when the bus supports tagged frames
+        self.link = None
+        if self.mode == "http":
+            assert self.mcc is None, "HTTP mode does not require an MCC object."
+            if self.transport is None:
+                self.transport = HTTPTransport()
+
+        self.default_controls = self.controls.copy()
+        # last register image confirmed on the device, None when unknown
+        self.device_controls = None
+        self.upload_interrupted = False
+        self.readback_validity = 0.05
+        self.readback_cache = None
+        self.readback_lock = threading.Lock()
+        self.default_parameters = {}
+        self.mapping = {}
+        self.codec = Codec(self.mapping)
+        # data field of a memory port -> {address: word} as last loaded through load_memory
+        self.memory_shadow = {}
+        self.memory_statistics = None
+    
+    def set_default_control(self) -> object:
+        self.set_control(self.default_controls)
+        return self
+    
+    def read_control(self) -> Union[dict[int, int], None]:
+        # readers within readback_validity seconds of each other share one fetch
+        with self.readback_lock:
+            if self.readback_cache is not None and time.monotonic() - self.readback_cache[0] < self.readback_validity:
+                return self.readback_cache[1].copy()
+            controls = self.fetch_control()
+            if controls is not None:
+                self.readback_cache = (time.monotonic(), controls)
+                return controls.copy()
+        return None
+
+    def fetch_control(self) -> Union[dict[int, int], None]:
+        # registers currently on the device, None when they cannot be read
+        try:
+            if self.mode == "default":
+                if self.mcc is None:
+                    return None
+                # every reply carries the whole control map, so one call is enough unless some entry is missing
+                if hasattr(self.mcc, "get_controls"):
+                    response = self.mcc.get_controls()
+                else:
+                    response = self.mcc.get_control(0)
+                return {i:response[i] if i in response else self.mcc.get_control(i)[i] for i in range(16)}
+            elif self.mode == "http":
+                return self.transport.get_snapshot().get(self.slot)
+            elif self.mode == "AXKU041":
+                if hasattr(self.mcc, "read_block"):
+                    # all 16 registers of the slot in one framed transaction
+                    words = self.mcc.read_block((self.slot - 1) * 16, 16)
+                    if type(words) in (bytes, bytearray):
+                        words = [words[4 * i:4 * i + 4] for i in range(16)]
+                    return {i:int.from_bytes(words[i], "big") if type(words[i]) in (bytes, bytearray) else words[i] for i in range(16)}
+                if self.link is not None:
+                    replies = [self.link.submit(("read", i + (self.slot - 1) * 16)) for i in range(16)]
+                    return {i:int.from_bytes(replies[i].result(), "big") for i in range(16)}
+                controls = {}
+                for i in range(15, -1, -1):
+                    controls[i] = int.from_bytes(self.mcc.read(i + (self.slot - 1) * 16), "big")
+                return controls
+        except Exception as e:
+            self.device_controls = None
+            raise Exception("Connection error: %s"%e.__repr__())
+
+    def download_control(self, snapshot: dict[int, dict[int, int]] = None) -> object:
+        # snapshot is a register dump of all slots already read by the caller
+        if snapshot is None:
+            controls = self.read_control()
+        else:
+            controls = snapshot.get(self.slot)
+        if controls is not None:
+            self.controls.update(controls)
+            self.device_controls = controls.copy()
+        elif self.mode == "http":
+            self.controls.update({index:0 for index in range(16)})
+            self.device_controls = None
+        return self
+
+    def invalidate_control(self) -> object:
+        # forget the device image, the next upload then writes every register
+        self.device_controls = None
+        self.readback_cache = None
+        return self
+
+    def forget_memory(self) -> object:
+        # the slot was deployed again or reset, the RAM of the design no longer holds what was loaded
+        self.memory_shadow = {}
+        return self
+
+    def dirty_controls(self, controls: dict[int, int]) -> list[int]:
+        # registers differing from the device image, from high to low so that register 0 lands last
+        if self.device_controls is None:
+            return list(range(15, -1, -1))
+        return [i for i in range(15, -1, -1) if controls[i] != self.device_controls[i]]
+
+    def plan_blocks(self, dirty: list[int]) -> list[list[int]]:
+        # groups the dirty registers into transfers, each block lists ascending control indices
+        # registers 1 to 15 go out as one block spanning the dirty ones, the clean registers in between are
+        # rewritten with the value they already hold, and register 0 always follows in its own write
+        if not hasattr(self.mcc, "write_block"):
+            return [[i] for i in dirty]
+        upper = [i for i in dirty if i != 0]
+        blocks = []
+        if len(upper) == 1:
+            blocks.append(upper)
+        elif len(upper) > 1:
+            blocks.append(list(range(min(upper), max(upper) + 1)))
+        if 0 in dirty:
+            blocks.append([0])
+        return blocks
+
+    def pending_writes(self, controls: dict[int, int], force: bool = False) -> dict[int, int]:
+        return {i:controls[i] for i in (range(15, -1, -1) if force else self.dirty_controls(controls))}
+
+    def confirm_control(self, controls: dict[int, int]) -> object:
+        # record an image written on behalf of this instrument by a combined transfer
+        self.upload_interrupted = False
+        self.readback_cache = None
+        self.device_controls = {i:controls[i] for i in range(16)}
+        return self
+
+    def upload_control(self, controls: dict[int, int] = None, force: bool = False, preempt: callable = None) -> object:
+        # preempt is polled between register writes, when it returns True the upload stops early
+        # and upload_interrupted is set, the registers written so far are kept in the device image
+        self.upload_interrupted = False
+        if controls is None:
+            controls = self.controls.copy()
+        if force:
+            dirty = list(range(15, -1, -1))
+        else:
+            dirty = self.dirty_controls(controls)
+        if not dirty:
+            return self
+        if self.device_controls is None:
+            preempt = None
+        self.readback_cache = None
+        if self.mode == "default":
+            try:
+                for i in dirty:
+                    if preempt is not None and i != dirty[0] and preempt():
+                        self.upload_interrupted = True
+                        return self
+                    self.mcc.set_control(i, controls[i])
+                    if self.device_controls is not None:
+                        self.device_controls[i] = controls[i]
+            except Exception as e:
+                self.device_controls = None
+                raise Exception("Connection error: %s"%e.__repr__())
+        elif self.mode == "http":
+            try:
+                self.transport.post_registers({self.slot: self.pending_writes(controls, force)})
+            except Exception as e:
+                self.device_controls = None
+                raise Exception("Connection error: %s"%e.__repr__())
+        elif self.mode == "AXKU041" and self.link is not None and not hasattr(self.mcc, "write_block"):
+            try:
+                # registers 15 to 1 are all outstanding at once, register 0 goes after they are acknowledged
+                replies = [self.link.submit(("write", i + (self.slot - 1) * 16, controls[i])) for i in dirty if i != 0]
+                for reply in replies:
+                    reply.result()
+                if 0 in dirty:
+                    self.link.call(("write", (self.slot - 1) * 16, controls[0]))
+            except Exception as e:
+                self.device_controls = None
+                raise Exception("Connection error: %s"%e.__repr__())
+        elif self.mode == "AXKU041":
+            try:
+                for block in self.plan_blocks(dirty):
+                    if preempt is not None and block[-1] != dirty[0] and preempt():
+                        self.upload_interrupted = True
+                        return self
+                    if len(block) == 1:
+                        self.mcc.write(block[0] + (self.slot - 1) * 16, controls[block[0]])
+                    else:
+                        self.mcc.write_block(block[0] + (self.slot - 1) * 16, [controls[i] for i in block])
+                    if self.device_controls is not None:
+                        for i in block:
+                            self.device_controls[i] = controls[i]
+            except Exception as e:
+                self.device_controls = None
+                raise Exception("Connection error: %s"%e.__repr__())
+        self.device_controls = {i:controls[i] for i in range(16)}
+        return self
+
+    def set_control(self, *arg) -> object:
+        if len(arg) == 1 and arg[0] is not None:
+            self.controls.update(arg[0])
+        elif len(arg) == 2:
+            self.controls[arg[0]] = arg[1]
+        return self
+
+    def get_control(self, i: int) -> int:
+        return self.controls[i]
+    
+    def set_bit(self, control: int, index: int, bit: str) -> object:
+        def write(words: array.array) -> None:
+            words[control] = set_bit(words[control], index, bit)
+        self.controls.modify(write)
+        return self
+        
+    def set_hex(self, control: int, index: int, hexa: str) -> object:
+        def write(words: array.array) -> None:
+            words[control] = set_hex(words[control], index, hexa)
+        self.controls.modify(write)
+        return self
+
+    def set_default_parameter(self) -> object:
+        self.set_parameters(self.default_parameters)
+        return self
+
+    # writes commit a whole parameter set at once and reads decode one snapshot, so no field is ever seen half written
+    def set_parameter(self, name: str, value: int) -> object:
+        self.controls.modify(lambda words: self.codec.set_parameter(words, name, value))
+        return self
+
+    def get_parameter(self, name: str) -> int:
+        return self.codec.get_parameter(self.controls.snapshot(), name)
+
+    def set_parameters(self, parameters: dict[str, int]) -> object:
+        self.controls.modify(lambda words: self.codec.set_parameters(words, parameters))
+        return self
+
+    def get_parameters(self, names: list[str]) -> dict[str, int]:
+        return self.codec.get_parameters(self.controls.snapshot(), names)
+
+    def apply_masks(self, keep: dict[int, int], bits: dict[int, int]) -> object:
+        # writes the registers precomputed by Codec.masks in one commit
+        self.controls.modify(lambda words: self.codec.apply(words, keep, bits))
+        return self
+
+    def set_quantity(self, name: str, value: float) -> object:
+        # value in the unit given by the parameter's scale in config.xml
+        raw = int(self.codec.to_raw(name, value))
+        self.controls.modify(lambda words: self.codec.set_parameter(words, name, raw))
+        return self
+
+    def get_quantity(self, name: str) -> float:
+        return self.codec.from_raw(name, self.get_parameter(name)).item()
+
+    def encode_quantities(self, quantities: dict[str, object]) -> np.ndarray:
+        # arrays of physical values to one register image per element, based on the current controls
+        return self.codec.encode_quantities(self.controls.snapshot(), quantities)
+
+    def decode_quantities(self, images: np.ndarray, names: list[str]) -> dict[str, np.ndarray]:
+        return self.codec.decode_quantities(images, names)
+
+class Turnkey(MCC):
+    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default", transport: HTTPTransport = None):
+        super().__init__(mcc, slot, controls, mode, transport)
+        self.default_parameters = parameters
+        self.mapping = mapping
+        self.codec = Codec(mapping)
+
+class Feedback(MCC):
+    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default", transport: HTTPTransport = None):
+        super().__init__(mcc, slot, controls, mode, transport)
+        self.default_parameters = parameters
+        self.mapping = mapping
+        self.codec = Codec(mapping)
+        self.waveform = []
+        # segments as last accepted by the device, None where a write failed
+        self.waveform_shadow = []
+        # digest of the waveform the device holds, None until one was uploaded
+        self.waveform_digest = None
+
+    def get_waveform_digest(self, waveform: list[dict[str, int]] = None) -> str:
+        waveform = self.waveform if waveform is None else waveform
+        return hashlib.sha256(repr([(segment["sign"], segment["x"], segment["y"], segment["slope"]) for segment in waveform]).encode()).hexdigest()
+
+    def get_changed_segments(self, waveform: list[dict[str, int]] = None) -> list[int]:
+        waveform = self.waveform if waveform is None else waveform
+        return [i for i in range(len(waveform)) if i >= len(self.waveform_shadow) or self.waveform_shadow[i] != waveform[i]]
+
+    def forget_memory(self) -> object:
+        super().forget_memory()
+        self.waveform_shadow = []
+        self.waveform_digest = None
+        return self
+
+    def forget_segment(self, index: int) -> None:
+        # the device may hold anything at index now
+        self.waveform_shadow[index] = None
+        self.waveform_digest = None
+
+class MCC_Template(MCC):
+    def __init__(self, mcc: object, slot: int, parameters: dict[str, int], mapping: dict[str, dict[str, int]], controls: dict[int, int] = None, mode: str = "default", transport: HTTPTransport = None):
+        super().__init__(mcc, slot, controls, mode, transport)
+        self.default_parameters = parameters
+        self.mapping = mapping
+        self.codec = Codec(mapping)
+
+class UploadHandle(concurrent.futures.Future):
+    # resolves with the time.time() at which the device accepted the registers, or with the transport error
+    def __init__(self, status: str = "queued"):
+        super().__init__()
+        self.status = status
+
+    def resolve(self, result: float = None, error: Exception = None) -> bool:
+        # a handle its caller cancelled or that is already resolved is left alone
+        try:
+            if error is not None:
+                self.set_exception(error)
+            else:
+                self.set_result(result)
+        except concurrent.futures.InvalidStateError:
+            return False
+        return True
+
+    def follow(self, handle: concurrent.futures.Future) -> None:
+        # done callback passing the outcome of handle on
+        if handle.cancelled():
+            self.cancel()
+        else:
+            self.resolve(handle.result() if handle.exception() is None else None, handle.exception())
+
+def combine_handles(handles: list[UploadHandle]) -> UploadHandle:
+    # one handle for several uploads, resolved once all of them are, with the first failure among them if any
+    if len(handles) == 1:
+        return handles[0]
+    combined = UploadHandle(handles[-1].status)
+    remaining = [len(handles)]
+    lock = threading.Lock()
+    def done(handle: UploadHandle) -> None:
+        with lock:
+            remaining[0] = remaining[0] - 1
+            if remaining[0]:
+                return
+        errors = [concurrent.futures.CancelledError() if handle.cancelled() else handle.exception() for handle in handles if handle.cancelled() or handle.exception() is not None]
+        combined.resolve(None if errors else handles[-1].result(), errors[0] if errors else None)
+    for handle in handles:
+        handle.add_done_callback(done)
+    return combined
+
+class Package():
+    # a register snapshot waiting in one of the uploading lanes of MIM
+    def __init__(self, instrument: MCC, controls: dict[int, int], lane: str):
+        self.instrument = instrument
+        self.controls = controls
+        self.lane = lane
+        self.queued_at = time.monotonic()
+        # number of requested uploads this package stands for after merging
+        self.count = 1
+        self.handles = [UploadHandle()]
+        # while uploading: (delta, controls) of the snapshots that overtook it, applied if it is preempted
+        self.overtaken = []
+        # while uploading: an emergency overtook it, it is dropped if preempted
+        self.superseded = False
+
+    def absorb(self, package: object) -> None:
+        self.count = self.count + package.count
+        self.handles.extend(package.handles)
+
+class Batch():
+    # collects uploads of one thread and commits them as one upload per instrument when the outermost batch exits
+    def __init__(self, mim: object, lane: str = "control"):
+        self.mim = mim
+        self.lane = lane
+        # instrument slot -> [purpose, lane, handles deferred to the commit]
+        self.pending = {}
+        # instrument slot -> [(field name, active value, idle value)]
+        self.edges = {}
+        self.handles = []
+
+    def __enter__(self) -> object:
+        self.mim.batches.stack = getattr(self.mim.batches, "stack", []) + [self]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.mim.batches.stack = self.mim.batches.stack[:-1]
+        if exc_type is not None:
+            # nothing of the batch goes out, callers waiting on touched handles learn why
+            for purpose, lane, deferred in self.pending.values():
+                for handle in deferred:
+                    handle.resolve(error = exc_value)
+            return False
+        if self.mim.batches.stack:
+            self.mim.batches.stack[-1].merge(self)
+        else:
+            self.commit()
+        return False
+
+    def merge(self, batch: object) -> None:
+        for slot in batch.pending:
+            purpose, lane, handles = batch.pending[slot]
+            self.touch(purpose, lane)
+            self.pending[slot][2].extend(handles)
+        for slot in batch.edges:
+            self.edges.setdefault(slot, []).extend(batch.edges[slot])
+
+    def touch(self, purpose: str, lane: str = None) -> UploadHandle:
+        slot = self.mim.get_instrument(purpose).slot
+        lane = lane or self.lane
+        if slot not in self.pending:
+            self.pending[slot] = [purpose, lane, []]
+        elif MIM.LANES.index(lane) < MIM.LANES.index(self.pending[slot][1]):
+            self.pending[slot][1] = lane
+        handle = UploadHandle()
+        self.pending[slot][2].append(handle)
+        return handle
+
+    def set_parameter(self, purpose: str, name: str, value: int) -> object:
+        self.mim.get_instrument(purpose).set_parameter(name, value)
+        self.touch(purpose)
+        return self
+
+    def edge(self, purpose: str, name: str, active: int, idle: int) -> object:
+        # the field is driven to active and back to idle at commit, after the other changes have landed
+        self.touch(purpose)
+        self.edges.setdefault(self.mim.get_instrument(purpose).slot, []).append((name, active, idle))
+        return self
+
+    def commit(self) -> list[UploadHandle]:
+        for slot in self.pending:
+            purpose, lane, deferred = self.pending[slot]
+            instrument = self.mim.get_instrument(slot)
+            edges = self.edges.get(slot, [])
+            for name, active, idle in edges:
+                instrument.set_parameter(name, idle)
+            # every package of the commit counts, a lost strobe must not hide behind a successful idle write
+            handles = []
+            if edges:
+                previous = self.mim.last_queued.get(slot, instrument.device_controls)
+                strobes = max([instrument.codec.fields[name].index for name, active, idle in edges])
+                # registers go out from high to low, so the data may ride along with the active strobe
+                # as long as every changed register sits strictly above the strobe register; http writes
+                # carry no such order, there the data always settles in a package of its own
+                current = instrument.controls.snapshot()
+                folded = self.mim.mode != "http" and previous is not None and all([i > strobes for i in range(16) if current[i] != previous[i]])
+                if not folded:
+                    handles.append(self.mim.enqueue(purpose, lane))
+                instrument.set_parameters({name:active for name, active, idle in edges})
+                handles.append(self.mim.enqueue(purpose, lane))
+                instrument.set_parameters({name:idle for name, active, idle in edges})
+            handles.append(self.mim.enqueue(purpose, lane))
+            handle = combine_handles(handles)
+            self.handles.append(handle)
+            for waiting in deferred:
+                handle.add_done_callback(waiting.follow)
+        return self.handles
+
+class CommandProgram():
+    # a command compiled against the codecs of the loaded configuration
+    # each stage goes out as one batch: the register writes of every instrument, then its pulses,
+    # then the optional wait once the device accepted the stage
+    def __init__(self, purpose: str, name: str, lane: str, stages: list[dict[str, object]]):
+        self.purpose = purpose
+        self.name = name
+        self.lane = lane
+        # [{"writes": {purpose: (keep, bits)}, "edges": {purpose: [(field name, active, idle)]}, "wait": seconds}]
+        self.stages = stages
+
+class MIM():
+    # uploading lanes from the highest priority to the lowest, pending data uploads rank between control and bulk
+    LANES = ("emergency", "control", "bulk")
+    # signal router entries letting the MIM module directly connect to the design's interface on AXKU041
+    AXKU041_ROUTING = ((0, 10), (1, 11), (2, 12), (3, 13), (6, 6), (7, 7), (8, 8), (9, 9))
+    # SPI frames configuring both ADCs of AXKU041
+    AXKU041_ADC_SETUP = (b"\x00\x14\x41", b"\x00\x17\x06", b"\x00\xFF\x01")
+    # entries of the segment table of the AWG design
+    WAVEFORM_SEGMENTS = 8
+    # attributes set by parse_config, kept aside while a dry run parses the configuration
+    PARSED_STATE = ("config", "instruments", "purposes", "bitstreams", "other_instruments", "connections", "frontends", "outputs", "programs")
+    # built-in commands in the layout of the <commands> entries compiled by config_index,
+    # they are only compiled for configurations having their fields and an entry of config.xml with the same name replaces them
+    DEFAULT_COMMANDS = {
+        "turnkey": {
+            "run": {"lane": "control", "steps": [{"action": "set", "parameter": "mode", "value": 0}, {"action": "set", "parameter": "Reset", "value": 0}, {"action": "set", "parameter": "manual_offset", "value": 0}]},
+            "stop": {"lane": "emergency", "steps": [{"action": "set", "parameter": "Reset", "value": 1}]},
+            "sweep": {"lane": "control", "steps": [{"action": "set", "parameter": "mode", "value": 1}, {"action": "set", "parameter": "Reset", "value": 0}, {"action": "set", "parameter": "manual_offset", "value": 0}]},
+            "power_lock_on": {"lane": "control", "steps": [{"action": "set", "parameter": "PID_lock", "value": 0}]},
+            "power_lock_off": {"lane": "emergency", "steps": [{"action": "set", "parameter": "PID_lock", "value": 1}]},
+        },
+        "feedback": {
+            "LO_on": {"lane": "control", "steps": [{"action": "set", "parameter": "LO_Reset", "value": 0}]},
+            "LO_off": {"lane": "emergency", "steps": [{"action": "set", "parameter": "LO_Reset", "value": 1}]},
+            "fast_PID_on": {"lane": "control", "steps": [{"action": "set", "parameter": "fast_PID_Reset", "value": 0}]},
+            "fast_PID_off": {"lane": "emergency", "steps": [{"action": "set", "parameter": "fast_PID_Reset", "value": 1}]},
+            "slow_PID_on": {"lane": "control", "steps": [{"action": "set", "parameter": "slow_PID_Reset", "value": 0}]},
+            "slow_PID_off": {"lane": "emergency", "steps": [{"action": "set", "parameter": "slow_PID_Reset", "value": 1}]},
+            "auto_match_on": {"lane": "control", "steps": [{"action": "set", "parameter": "enable_auto_match", "value": 0}]},
+            "auto_match_off": {"lane": "emergency", "steps": [{"action": "set", "parameter": "enable_auto_match", "value": 1}]},
+            "launch_auto_match": {"lane": "control", "steps": [{"action": "pulse", "parameter": "initiate_auto_match", "active": 0, "idle": 1}]},
+            "launch_frequency_control": {"lane": "control", "steps": [{"action": "pulse", "parameter": "initiate", "active": 0, "idle": 1}]},
+        },
+    }
+
+    def __init__(self, ip, config_id = "1", logger = None, coalescing = False, max_in_flight = 64, data_upload_interval = 0.02, pipeline_window = 8, baudrates = (921600, 460800, 230400, 115200), deploy_workers = 1):
+        self.logger = logger
+        self.config_id = config_id
+        self.transport = None
+        self.link = None
+        if re.match(r"^([0-9]{1,3}\.){3}[0-9]{1,3}$", ip) or re.match(r"^\[([0-9a-fA-F]{0,4}:){5,7}[0-9a-fA-F]{0,4}\]$", ip):
+            self.ip = ip
+            self.mode = "default"
+            load_moku()
+            # claim ownership at class initialization under default mode
+            self.mim = instruments.MultiInstrument(self.ip, force_connect = True, platform_id = 4)
+        elif ip == "local":
+            self.ip = "192.168.73.1"
+            self.mode = "http"
+            load_moku()
+            self.transport = HTTPTransport(self.ip)
+            # verify the connection by sending a request
+            try:
+                self.transport.get_registers()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Connection error: %s"%e.__repr__())
+                raise Exception("Connection error: %s"%e.__repr__())
+        elif re.match(r"^COM[0-9]{1,2}$", ip):
+            # Serial connection indicates instead of Moku:Pro,
+            # the custom FPGA design running on AXKU041 is used.
+            self.ip = ip
+            self.mode = "AXKU041"
+            try:
+                load_AXKU041()
+                self.connect_timing = {}
+                start = time.monotonic()
+                self.serial = uart.MySerial(self.ip, baudrate = 19200, parity = "E", timeout = 0.5)
+                self.bus = bus.Bus(self.serial)
+                self.connect_timing["serial"] = time.monotonic() - start
+                step = time.monotonic()
+                self.negotiate_baudrate(baudrates)
+                self.connect_timing["baudrate"] = time.monotonic() - step
+                self.module_mim = module_moku_mim_wrapper.ModuleMokuMIMWrapper(self.bus, self.config_id)
+                if pipeline_window > 1 and hasattr(self.module_mim, "send_tagged") and hasattr(self.module_mim, "receive_tagged"):
+                    # keep several register accesses on the line instead of waiting for each reply, the wrapper
+                    # turns the register addresses into bus addresses exactly as for its own read and write
+                    self.link = pipelined_bus.PipelinedBus(self.module_mim.send_tagged, self.module_mim.receive_tagged, window = pipeline_window, timeout = 0.5, logger = self.logger)
+                self.module_router = module_signal_router.ModuleSignalRouter(self.bus)
+                self.sp = spi.Spi(self.serial)
+                self.setup_board()
+                self.connect_timing["total"] = time.monotonic() - start
+                if self.logger:
+                    self.logger.info("AXKU041 connected, timing: %s."%", ".join(["%s %.3fs"%(step, duration) for step, duration in self.connect_timing.items()]))
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Connection error: %s"%e.__repr__())
+                raise Exception("Connection error: %s"%e.__repr__())
+        else:
+            if self.logger:
+                self.logger.error("Invalid IP address.")
+            raise Exception("Invalid IP address.")
+        if self.logger:
+            self.logger.debug("MIM Created.")
+        self.instruments = {1:None, 2:None, 3:None, 4:None}
+        self.purposes = {}
+        self.config = None
+        # what this session applied, compared against when the device cannot be read back
+        self.applied = {"connections": None, "frontends": {}, "outputs": {}} if self.mode != "AXKU041" else {"config": None}
+        self.reconcile_plan = []
+        # (purpose, name) -> CommandProgram of the loaded configuration
+        self.programs = {}
+        if self.mode == "default" or self.mode == "http":
+            self.bitstreams = {1:None, 2:None, 3:None, 4:None}
+            self.other_instruments = {1:None, 2:None, 3:None, 4:None}
+            self.connections = []
+            self.frontends = {}
+            self.outputs = {}
+            # slot -> (bitstream digest or instrument name, instrument object) of what this session deployed
+            self.deployed = {}
+            # path -> (mtime, size, digest), spares hashing unchanged bitstream files again
+            self.bitstream_digests = {}
+            # slots deployed at the same time through the shared MultiInstrument, opt in only where the client supports it
+            self.deploy_workers = deploy_workers
+            self.deploy_timing = {}
+        
+        # uploads are handed to the uploader thread through deques guarded by one condition
+        self.uploading_lanes = {lane:collections.deque() for lane in self.LANES}
+        # latest value per instrument, a newer value replaces the pending one
+        self.data_mailbox = {}
+        # minimum time between two data uploads of the same instrument
+        self.data_upload_interval = data_upload_interval
+        self.data_uploaded_at = {}
+        self.uploading_condition = threading.Condition()
+        # merge consecutive snapshots of one instrument when no edge would be lost
+        self.coalescing = coalescing
+        # queued plus uploading packages allowed before upload_control blocks
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.upload_statistics = {"queued": 0, "uploaded": 0, "coalesced": 0, "superseded": 0, "preempted": 0, "failed": 0, "max_depth": 0}
+        self.lane_statistics = {lane:{"uploads": 0, "total_latency": 0.0, "max_latency": 0.0} for lane in self.LANES + ("data",)}
+        # the newest snapshot queued for each slot, used to rebase older snapshots in lower lanes
+        self.last_queued = {}
+        # the package the uploader is writing, a preempted one is resumed with what overtook it in the meantime
+        self.uploading_package = None
+        self.refresh_thread = None
+        self.refresh_interval = 0.5
+        self.refresh_stopping_flag = False
+        self.refresh_callbacks = []
+        self.config_watch_thread = None
+        self.config_watch_interval = 0.5
+        self.config_watch_stopping_flag = False
+        self.config_watch_confirm = None
+        # structural changes waiting for confirmation, see reload_config
+        self.pending_config = None
+        # the back buffer of the waveform table, quantized in the background while the current table plays
+        self.staged_waveform = None
+        self.waveform_executor = None
+        self.waveform_statistics = None
+        # open batches of each thread
+        self.batches = threading.local()
+        self.uploader = threading.Thread(target = self.uploader_function, args = (), daemon = True)
+        self.uploader.start()
+
+    def setup_board(self) -> object:
+        # skip the routing and ADC setup when the board still holds it from an earlier session
+        start = time.monotonic()
+        configured = self.board_configured()
+        self.connect_timing["check"] = time.monotonic() - start
+        if configured:
+            if self.logger:
+                self.logger.debug("Board already configured, skipping setup.")
+            return self
+        start = time.monotonic()
+        # Set up the routing to let the MIM module directly connect to design's interface
+        for source, destination in self.AXKU041_ROUTING:
+            self.module_router.set_routing(source, destination)
+        self.module_router.upload()
+        self.connect_timing["routing"] = time.monotonic() - start
+        start = time.monotonic()
+        for adc in ("adc1", "adc2"):
+            for frame in self.AXKU041_ADC_SETUP:
+                self.sp.write(adc, 3, 3, frame)
+        self.connect_timing["adc"] = time.monotonic() - start
+        return self
+
+    def board_configured(self) -> bool:
+        # needs routing and SPI readback from the AXKU041 modules, without it the setup always runs
+        if not (hasattr(self.module_router, "download") and hasattr(self.module_router, "get_routing") and hasattr(self.sp, "read")):
+            return False
+        try:
+            self.module_router.download()
+            for source, destination in self.AXKU041_ROUTING:
+                if self.module_router.get_routing(source) != destination:
+                    return False
+            for adc in ("adc1", "adc2"):
+                for frame in self.AXKU041_ADC_SETUP:
+                    if frame[1] == 0xFF:
+                        # the transfer register clears itself
+                        continue
+                    # reading sets the top bit of the instruction, the value comes back in the last byte
+                    if self.sp.read(adc, 3, 3, bytes([frame[0] | 0x80, frame[1], 0]))[-1] != frame[2]:
+                        return False
+        except Exception as e:
+            if self.logger:
+                self.logger.debug("Board readback failed: %s"%e.__repr__())
+            return False
+        return True
+
+    def negotiate_baudrate(self, candidates: tuple[int, ...]) -> int:
+        # try the fastest rate both ends support, verified by a loopback pattern, and stay on the current rate otherwise
+        # needs the UART divider command of the FPGA design, exposed by the bus as set_baudrate and echo
+        base = self.serial.baudrate
+        self.baudrate = base
+        if not (hasattr(self.bus, "set_baudrate") and hasattr(self.bus, "echo")):
+            if self.logger:
+                self.logger.debug("Baud rate negotiation not supported by the bus, staying at %d."%base)
+            return base
+        if hasattr(self.bus, "get_baudrates"):
+            supported = [rate for rate in candidates if rate in self.bus.get_baudrates()]
+        else:
+            supported = list(candidates)
+        pattern = bytes(range(256))
+        for rate in sorted(supported, reverse = True):
+            if rate <= base:
+                break
+            switched = False
+            try:
+                # the board acknowledges at the old rate before switching
+                self.bus.set_baudrate(rate)
+                switched = True
+                self.serial.baudrate = rate
+                start = time.monotonic()
+                reply = self.bus.echo(pattern)
+                elapsed = time.monotonic() - start
+                if reply != pattern:
+                    raise Exception("Loopback pattern mismatch.")
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug("Baud rate %d rejected: %s"%(rate, e.__repr__()))
+                self.fall_back_baudrate(base, rate, switched, pattern)
+                continue
+            self.baudrate = rate
+            if self.logger:
+                self.logger.info("Serial link running at %d baud, loopback throughput %.0f B/s."%(rate, 2 * len(pattern) / elapsed))
+            return rate
+        if self.logger:
+            self.logger.info("Serial link staying at %d baud."%base)
+        return base
+
+    def fall_back_baudrate(self, base: int, rate: int, switched: bool, pattern: bytes) -> None:
+        # bring both ends back to base after rate failed, the board only understands the revert at the rate it runs at
+        if switched:
+            self.serial.baudrate = rate
+            try:
+                self.bus.set_baudrate(base)
+            except Exception:
+                pass
+        self.serial.baudrate = base
+        try:
+            if self.bus.echo(pattern) == pattern:
+                return
+        except Exception:
+            pass
+        if not switched:
+            # the board may have switched although its acknowledgement was lost
+            self.serial.baudrate = rate
+            try:
+                self.bus.set_baudrate(base)
+            except Exception:
+                pass
+            self.serial.baudrate = base
+            try:
+                if self.bus.echo(pattern) == pattern:
+                    return
+            except Exception:
+                pass
+        raise Exception("Serial link lost while falling back from %d to %d baud."%(rate, base))
+
+    def get_slot(self, type: str) -> Union[int, None]:
+        if type in self.purposes:
+            return self.purposes[type]
+        return None
+
+    def get_instrument(self, arg: Union[int, str, None]) -> Union[Turnkey, Feedback, None]:
+        if type(arg) == int:
+            return self.instruments[arg]
+        elif type(arg) == str:
+            return self.get_instrument(self.get_slot(arg))
+        return None
+
+    def parse_config(self) -> object:
+        # parse config from xml
+        if self.logger:
+            self.logger.debug("Parsing configuration.")
+        self.config = config_index.get_index(self.logger).get_config(self.config_id)
+        if self.logger:
+            if self.mode == "default" or self.mode == "http":
+                if self.config["platform"] and self.config["firmware"] and self.config["comb_id"]:
+                    self.logger.debug("Configuration found, working on %s firmware version %s with comb No.%s. %s"%(self.config["platform"], self.config["firmware"], self.config["comb_id"], self.config["description"]))
+                else:
+                    # a miscellanous configuration
+                    self.logger.debug("Configuration found, working with %s."%self.config["description"])
+            elif self.mode == "AXKU041":
+                # Verify if the configuration is supported in the design
+                if self.config["AXKU041_supported"]:
+                    self.logger.debug("Configuration found, working on AXKU041. %s"%self.config["description"])
+                else:
+                    raise Exception("The chosen configuration is not supported on AXKU041.")
+        
+        # set up instruments
+        self.instruments = {1:None, 2:None, 3:None, 4:None}
+        self.purposes = {}
+        if self.mode == "default" or self.mode == "http":
+            self.bitstreams = {1:None, 2:None, 3:None, 4:None}
+            self.other_instruments = {1:None, 2:None, 3:None, 4:None}
+        for i in self.config["instruments"]:
+            match i["type"]:
+                case "CloudCompile":
+                    slot = i["slot"]
+                    mapping, parameters = compile_mapping(i["parameters"])
+                    if self.mode == "default" or self.mode == "http":
+                        mcc_object = None
+                        self.bitstreams[slot] = "./bitstreams/" + i["bitstream"] + ".tar.gz"
+                    elif self.mode == "AXKU041":
+                        parameters = compile_mapping(i["parameters_for_AXKU041"] or {})[1]
+                        mcc_object = self.module_mim
+                    match i["purpose"]:
+                        case "turnkey":
+                            if self.logger:
+                                self.logger.debug("Creating turnkey.")
+                            self.instruments[slot] = Turnkey(mcc_object, slot, parameters, mapping, {}, self.mode, self.transport)
+                            self.purposes["turnkey"] = slot
+                        case "feedback":
+                            if self.logger:
+                                self.logger.debug("Creating feedback.")
+                            self.instruments[slot] = Feedback(mcc_object, slot, parameters, mapping, {}, self.mode, self.transport)
+                            self.purposes["feedback"] = slot
+                        case "feedback and turnkey":
+                            if self.logger:
+                                self.logger.debug("Creating feedback and turnkey.")
+                            self.instruments[slot] = Feedback(mcc_object, slot, parameters, mapping, {}, self.mode, self.transport)
+                            self.purposes["feedback"] = slot
+                            self.purposes["turnkey"] = slot
+                        case _:
+                            if self.logger:
+                                self.logger.debug("Unregistered MCC purpose.")
+                            self.instruments[slot] = MCC_Template(mcc_object, slot, parameters, mapping, {}, self.mode, self.transport)
+                            self.purposes[i["purpose"]] = slot
+                    self.instruments[slot].link = self.link
+                case _:
+                    if self.mode == "default" or self.mode == "http":
+                        if self.logger:
+                            self.logger.debug("Creating %s."%i["type"])
+                        slot = i["slot"]
+                        self.other_instruments[slot] = eval("instruments.%s"%i["type"])
+                    elif self.mode == "AXKU041":
+                        if self.logger:
+                            self.logger.debug("Skipping the creation of %s."%i["type"])
+        self.compile_commands()
+
+        if self.mode == "default" or self.mode == "http":
+            # set up connections, frontends and outputs
+            if self.logger:
+                self.logger.debug("Setting connections.")
+            self.connections = [connection.copy() for connection in self.config["connections"]]
+
+            if self.logger:
+                self.logger.debug("Setting frontends and outputs.")
+            self.frontends = {channel:frontend.copy() for channel, frontend in self.config["frontends"].items()}
+            self.outputs = {channel:output.copy() for channel, output in self.config["outputs"].items()}
+        return self
+
+    def upload_config(self) -> object:
+        if self.logger:
+            self.logger.debug("Uploading configuration.")
+        if self.mode == "http":
+            # claim ownership at uploading function under http mode
+            self.mim = instruments.MultiInstrument(self.ip, force_connect = True, platform_id = 4)
+            # the objects of the previous session are gone with its ownership
+            self.deployed = {}
+        if self.mode == "default" or self.mode == "http":
+            self.deploy_instruments()
+            self.mim.set_connections(self.connections)
+            for i in self.frontends:
+                self.mim.set_frontend(i, self.frontends[i]["impedance"], self.frontends[i]["coupling"], self.frontends[i]["attenuation"])
+            for i in self.outputs:
+                self.mim.set_output(i, self.outputs[i]["gain"])
+            self.applied = {"connections": list(self.connections), "frontends": self.frontends.copy(), "outputs": self.outputs.copy()}
+        elif self.mode == "AXKU041":
+            self.upload_module_config()
+        return self
+
+    def upload_module_config(self) -> object:
+        self.module_mim.set_config(self.config_id)
+        # Refresh the module
+        self.module_mim.reset()
+        # Set the module to the specified configuration
+        self.module_mim.enable()
+        self.module_mim.upload()
+        for purpose in self.purposes:
+            self.get_instrument(purpose).invalidate_control().forget_memory()
+        self.applied = {"config": self.config_id}
+        return self
+
+    def get_bitstream_digest(self, path: str) -> str:
+        status = os.stat(path)
+        if path in self.bitstream_digests and self.bitstream_digests[path][:2] == (status.st_mtime_ns, status.st_size):
+            return self.bitstream_digests[path][2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        self.bitstream_digests[path] = (status.st_mtime_ns, status.st_size, digest.hexdigest())
+        return digest.hexdigest()
+
+    def deploy_slot(self, slot: int) -> tuple[int, object, float]:
+        start = time.monotonic()
+        if self.bitstreams[slot]:
+            result = self.mim.set_instrument(slot, instruments.CloudCompile, bitstream = self.bitstreams[slot])
+        else:
+            result = self.mim.set_instrument(slot, self.other_instruments[slot])
+        return slot, result, time.monotonic() - start
+
+    def deploy_instruments(self, keep_others: bool = False) -> object:
+        # bitstreams already running in their slot are kept, the remaining slots are deployed one after another,
+        # or concurrently with deploy_workers above 1 where the Moku client allows it
+        # other instruments are deployed again to reset them unless keep_others is set
+        start = time.monotonic()
+        self.deploy_timing = {}
+        pending = []
+        for i in range(1, 5):
+            if self.bitstreams[i]:
+                digest = self.get_bitstream_digest(self.bitstreams[i])
+                if i in self.deployed and self.deployed[i][0] == digest:
+                    self.instruments[i].mcc = self.deployed[i][1]
+                    self.instruments[i].invalidate_control()
+                    # None marks a slot kept from the previous deployment
+                    self.deploy_timing[i] = None
+                    continue
+                self.deployed.pop(i, None)
+                pending.append((i, digest))
+            elif self.other_instruments[i]:
+                name = self.other_instruments[i].__name__
+                if keep_others and i in self.deployed and self.deployed[i][0] == name:
+                    self.instruments[i] = self.deployed[i][1]
+                    self.deploy_timing[i] = None
+                    continue
+                self.deployed.pop(i, None)
+                pending.append((i, name))
+        if pending:
+            with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, min(self.deploy_workers, len(pending)))) as executor:
+                futures = {executor.submit(self.deploy_slot, i):digest for i, digest in pending}
+                errors = []
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        slot, result, elapsed = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    self.deploy_timing[slot] = elapsed
+                    if self.bitstreams[slot]:
+                        self.instruments[slot].mcc = result
+                        self.instruments[slot].invalidate_control().forget_memory()
+                    else:
+                        self.instruments[slot] = result
+                    self.deployed[slot] = (futures[future], result)
+                if errors:
+                    if self.logger:
+                        self.logger.error("Deployment error: %s"%errors[0].__repr__())
+                    raise errors[0]
+        if self.logger:
+            self.logger.info("Instruments deployed in %.3fs, %s."%(time.monotonic() - start, ", ".join(["slot %d %s"%(slot, "cached" if self.deploy_timing[slot] is None else "%.3fs"%self.deploy_timing[slot]) for slot in sorted(self.deploy_timing)])))
+        self.deploy_timing["total"] = time.monotonic() - start
+        return self
+
+    def upload_parameter(self) -> object:
+        for purpose in self.purposes:
+            self.get_instrument(purpose).set_default_parameter()
+            self.upload_control(purpose, "bulk")
+        return self
+
+    def initialize(self, reconcile: bool = False, dry_run: bool = False) -> object:
+        # reconcile only applies what differs from the device, dry_run only plans it, see reconcile
+        if self.logger:
+            self.logger.info("Initializing MIM.")
+        if dry_run:
+            # plan against a parsed copy, the live instruments and their register images stay untouched
+            live = {name:getattr(self, name) for name in self.PARSED_STATE if hasattr(self, name)}
+            try:
+                self.parse_config()
+                self.reconcile(dry_run = True)
+            finally:
+                for name, value in live.items():
+                    setattr(self, name, value)
+            return self
+        self.parse_config()
+        # the configuration just parsed already holds any structural edit waiting for confirmation
+        self.pending_config = None
+        if reconcile:
+            self.reconcile()
+            return self
+        self.upload_config()
+        self.upload_parameter()
+        return self
+
+    def read_layout(self) -> Union[list[str], None]:
+        # instrument names per slot as reported by the device, None when it cannot tell
+        if not hasattr(self.mim, "get_instruments"):
+            return None
+        try:
+            layout = [str(name) for name in self.mim.get_instruments()]
+            return (layout + [""] * 4)[:4]
+        except Exception as e:
+            if self.logger:
+                self.logger.debug("Reading the instrument layout failed: %s"%e.__repr__())
+            return None
+
+    def read_io_setting(self, getter: str, channel: int, applied: dict[int, dict[str, str]]) -> Union[dict[str, str], None]:
+        if hasattr(self.mim, getter):
+            try:
+                return {key:str(value) for key, value in getattr(self.mim, getter)(channel).items()}
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug("Reading %s(%d) failed: %s"%(getter, channel, e.__repr__()))
+        return applied.get(channel)
+
+    def plan_reconcile(self) -> list[dict[str, object]]:
+        # differences between the parsed configuration and the device, each entry is
+        # {"kind": ..., "target": ..., "current": ..., "desired": ...} with kind among
+        # "instrument", "config", "connections", "frontend", "output" and "parameter"
+        plan = []
+        redeployed = []
+        if self.mode == "default" or self.mode == "http":
+            layout = self.read_layout()
+            for i in range(1, 5):
+                if self.bitstreams[i]:
+                    name, desired = "CloudCompile", self.get_bitstream_digest(self.bitstreams[i])
+                elif self.other_instruments[i]:
+                    name = desired = self.other_instruments[i].__name__
+                else:
+                    continue
+                current = self.deployed[i][0] if i in self.deployed else None
+                if current != desired or (layout is not None and name not in layout[i - 1]):
+                    plan.append({"kind": "instrument", "target": i, "current": current if layout is None else layout[i - 1], "desired": desired})
+                    redeployed.append(i)
+            if hasattr(self.mim, "get_connections"):
+                try:
+                    current = [{"source": str(connection["source"]), "destination": str(connection["destination"])} for connection in self.mim.get_connections()]
+                except Exception:
+                    current = self.applied.get("connections")
+            else:
+                current = self.applied.get("connections")
+            if current is None or sorted([(connection["source"], connection["destination"]) for connection in current]) != sorted([(connection["source"], connection["destination"]) for connection in self.connections]):
+                plan.append({"kind": "connections", "target": None, "current": current, "desired": self.connections})
+            for i in self.frontends:
+                current = self.read_io_setting("get_frontend", i, self.applied.get("frontends", {}))
+                if current is None or any([current.get(key) != value for key, value in self.frontends[i].items()]):
+                    plan.append({"kind": "frontend", "target": i, "current": current, "desired": self.frontends[i]})
+            for i in self.outputs:
+                current = self.read_io_setting("get_output", i, self.applied.get("outputs", {}))
+                if current is None or any([current.get(key) != value for key, value in self.outputs[i].items()]):
+                    plan.append({"kind": "output", "target": i, "current": current, "desired": self.outputs[i]})
+        elif self.mode == "AXKU041":
+            current = self.applied.get("config")
+            if hasattr(self.module_mim, "get_config"):
+                try:
+                    current = str(self.module_mim.get_config())
+                except Exception:
+                    pass
+            if current != self.config_id:
+                plan.append({"kind": "config", "target": None, "current": current, "desired": self.config_id})
+                redeployed = [1, 2, 3, 4]
+        snapshot = self.read_snapshot() if len(redeployed) < 4 else {}
+        for instrument in self.get_mcc_instruments():
+            purpose = [purpose for purpose in self.purposes if self.get_instrument(purpose) is instrument][0]
+            if instrument.slot in redeployed or snapshot.get(instrument.slot) is None:
+                # a fresh or unreadable register image is written completely
+                current = {name:None for name in instrument.default_parameters}
+            else:
+                current = instrument.codec.get_parameters(snapshot[instrument.slot], list(instrument.default_parameters))
+            for name, value in instrument.default_parameters.items():
+                if current[name] != value:
+                    plan.append({"kind": "parameter", "target": purpose, "name": name, "current": current[name], "desired": value})
+        return plan
+
+    def reconcile(self, dry_run: bool = False) -> list[dict[str, object]]:
+        # bring the device to the parsed configuration by applying only the planned differences,
+        # untouched slots keep running so that locked loops are not disturbed
+        if self.mode == "http" and not hasattr(self, "mim"):
+            self.mim = instruments.MultiInstrument(self.ip, force_connect = True, platform_id = 4)
+            self.deployed = {}
+        if self.mode == "default" or self.mode == "http":
+            # reattach the objects of slots deployed earlier in this session
+            for i in range(1, 5):
+                if i in self.deployed:
+                    if self.bitstreams[i]:
+                        self.instruments[i].mcc = self.deployed[i][1]
+                    elif self.other_instruments[i]:
+                        self.instruments[i] = self.deployed[i][1]
+        plan = self.plan_reconcile()
+        self.reconcile_plan = plan
+        if self.logger:
+            for change in plan:
+                self.logger.info("%s %s %s: %s -> %s"%("Planned" if dry_run else "Applying", change["kind"], change["target"] if "name" not in change else "%s.%s"%(change["target"], change["name"]), change["current"], change["desired"]))
+            if not plan:
+                self.logger.info("Device already matches the configuration.")
+        if dry_run:
+            return plan
+        kinds = [change["kind"] for change in plan]
+        if "instrument" in kinds:
+            for change in plan:
+                if change["kind"] == "instrument":
+                    self.deployed.pop(change["target"], None)
+            self.deploy_instruments(keep_others = True)
+        if "config" in kinds:
+            self.upload_module_config()
+        if "connections" in kinds:
+            self.mim.set_connections(self.connections)
+            self.applied["connections"] = list(self.connections)
+        for change in plan:
+            if change["kind"] == "frontend":
+                self.mim.set_frontend(change["target"], self.frontends[change["target"]]["impedance"], self.frontends[change["target"]]["coupling"], self.frontends[change["target"]]["attenuation"])
+                self.applied["frontends"][change["target"]] = self.frontends[change["target"]]
+            elif change["kind"] == "output":
+                self.mim.set_output(change["target"], self.outputs[change["target"]]["gain"])
+                self.applied["outputs"][change["target"]] = self.outputs[change["target"]]
+        # the freshly parsed instruments start from the registers on the device, not from zeros,
+        # so that later uploads only carry what is changed on purpose
+        snapshot = self.read_snapshot()
+        for instrument in self.get_mcc_instruments():
+            instrument.download_control(snapshot)
+        if "parameter" in kinds:
+            # only registers differing from the device are written
+            for purpose in set([change["target"] for change in plan if change["kind"] == "parameter"]):
+                self.get_instrument(purpose).set_default_parameter()
+                self.upload_control(purpose, "bulk")
+            self.flush()
+        return plan
+    
+    def get_mcc_instruments(self) -> list[MCC]:
+        # an instrument serving several purposes is listed once
+        result = []
+        for purpose in self.purposes:
+            if self.get_instrument(purpose) not in result:
+                result.append(self.get_instrument(purpose))
+        return result
+
+    def read_snapshot(self) -> dict[int, dict[int, int]]:
+        if self.mode == "http":
+            return self.transport.get_snapshot()
+        snapshot = {}
+        for instrument in self.get_mcc_instruments():
+            controls = instrument.read_control()
+            if controls is not None:
+                snapshot[instrument.slot] = controls
+        return snapshot
+
+    def sync_download(self) -> object:
+        if self.logger:
+            self.logger.info("Synchronizing local parameters.")
+        snapshot = self.read_snapshot()
+        for instrument in self.get_mcc_instruments():
+            instrument.download_control(snapshot)
+        return self
+
+    def start_refresh(self, interval: float = 0.5, callback: callable = None) -> object:
+        # poll the device in the background, callbacks receive {slot: {control index: value}} of what changed
+        if callback is not None:
+            self.refresh_callbacks.append(callback)
+        self.refresh_interval = interval
+        if self.refresh_thread is None or not self.refresh_thread.is_alive():
+            self.refresh_stopping_flag = False
+            self.refresh_thread = threading.Thread(target = self.refresh_function, args = (), daemon = True)
+            self.refresh_thread.start()
+        return self
+
+    def stop_refresh(self) -> object:
+        self.refresh_stopping_flag = True
+        return self
+
+    def refresh_function(self) -> None:
+        if self.logger:
+            self.logger.info("Refresh thread started.")
+        last = {}
+        while not self.refresh_stopping_flag:
+            try:
+                snapshot = self.read_snapshot()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Refresh failed: %s"%e.__repr__())
+            else:
+                deltas = {}
+                for slot, controls in snapshot.items():
+                    changed = {i:controls[i] for i in range(16) if slot not in last or last[slot][i] != controls[i]}
+                    if changed:
+                        deltas[slot] = changed
+                last = snapshot
+                if deltas:
+                    self.apply_refresh(deltas)
+                    for callback in self.refresh_callbacks:
+                        callback(deltas)
+            time.sleep(self.refresh_interval)
+        if self.logger:
+            self.logger.info("Refresh thread stopped.")
+
+    def start_config_watch(self, interval: float = 0.5, confirm: callable = None) -> object:
+        # follow edits of config.xml, confirm(changes) -> bool is asked before structural changes are applied
+        self.config_watch_interval = interval
+        self.config_watch_confirm = confirm
+        if self.config_watch_thread is None or not self.config_watch_thread.is_alive():
+            self.config_watch_stopping_flag = False
+            self.config_watch_thread = threading.Thread(target = self.config_watch_function, args = (), daemon = True)
+            self.config_watch_thread.start()
+        return self
+
+    def stop_config_watch(self) -> object:
+        self.config_watch_stopping_flag = True
+        return self
+
+    def config_watch_function(self) -> None:
+        if self.logger:
+            self.logger.info("Configuration watch started.")
+        index = config_index.get_index(self.logger)
+        while not self.config_watch_stopping_flag:
+            time.sleep(self.config_watch_interval)
+            config = self.config
+            if config is None:
+                continue
+            try:
+                # only a stat of both files unless they changed
+                index.refresh()
+                if index.sources.get(config["id"]) != config["digest"] and (self.pending_config is None or self.pending_config[0]["digest"] != index.sources.get(config["id"])):
+                    self.reload_config()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Configuration reload failed: %s"%e.__repr__())
+        if self.logger:
+            self.logger.info("Configuration watch stopped.")
+
+    def classify_config_change(self, old: dict[str, object], new: dict[str, object]) -> list[dict[str, object]]:
+        # each change is {"kind": "value", "mapping" or "structural", "target": ..., "name": ..., "current": ..., "desired": ...}
+        # value changes only touch defaults, mapping changes move or add bitfields of a running bitstream,
+        # structural changes need the instruments deployed or rerouted again
+        changes = []
+        variant = "parameters_for_AXKU041" if self.mode == "AXKU041" else "parameters"
+        for key in ("platform", "AXKU041_supported", "connections", "frontends", "outputs"):
+            if old[key] != new[key]:
+                changes.append({"kind": "structural", "target": key, "current": old[key], "desired": new[key]})
+        # commands are compiled again after every reload, they never touch the device
+        for purpose in sorted(set(old["commands"]) | set(new["commands"])):
+            for name in sorted(set(old["commands"].get(purpose, {})) | set(new["commands"].get(purpose, {}))):
+                if old["commands"].get(purpose, {}).get(name) != new["commands"].get(purpose, {}).get(name):
+                    changes.append({"kind": "command", "target": purpose, "name": name, "current": old["commands"].get(purpose, {}).get(name), "desired": new["commands"].get(purpose, {}).get(name)})
+        old_instruments = {i["slot"]:i for i in old["instruments"]}
+        new_instruments = {i["slot"]:i for i in new["instruments"]}
+        for slot in sorted(set(old_instruments) | set(new_instruments)):
+            old_instrument = old_instruments.get(slot)
+            new_instrument = new_instruments.get(slot)
+            if old_instrument is None or new_instrument is None or any([old_instrument[key] != new_instrument[key] for key in ("type", "purpose", "bitstream")]):
+                changes.append({"kind": "structural", "target": slot, "current": old_instrument and old_instrument["type"], "desired": new_instrument and new_instrument["type"]})
+                continue
+            if new_instrument["type"] != "CloudCompile":
+                continue
+            old_values = old_instrument[variant] or {}
+            new_values = new_instrument[variant] or {}
+            for name in list(new_instrument["parameters"]) + [name for name in old_instrument["parameters"] if name not in new_instrument["parameters"]]:
+                old_field = old_instrument["parameters"].get(name)
+                new_field = new_instrument["parameters"].get(name)
+                if old_field is None or new_field is None or any([old_field[key] != new_field[key] for key in ("index", "high", "low", "parts", "signed", "scale", "unit")]):
+                    changes.append({"kind": "mapping", "target": slot, "name": name, "current": old_field, "desired": new_field})
+                elif name in new_values and (name not in old_values or old_values[name]["value"] != new_values[name]["value"]):
+                    changes.append({"kind": "value", "target": slot, "name": name, "current": old_values[name]["value"] if name in old_values else None, "desired": new_values[name]["value"]})
+        return changes
+
+    def reload_config(self, confirmed: bool = False) -> list[dict[str, object]]:
+        # apply the edited active configuration, value and mapping changes go out as register deltas
+        # while structural ones wait for confirmation and then go through a reconciling initialize
+        old = self.config
+        new = config_index.get_index(self.logger).get_config(self.config_id)
+        changes = self.classify_config_change(old, new)
+        if self.logger:
+            for change in changes:
+                self.logger.info("Configuration %s change of %s%s: %s -> %s"%(change["kind"], change["target"], "" if "name" not in change else "." + change["name"], change["current"], change["desired"]))
+        if any([change["kind"] == "structural" for change in changes]):
+            if not confirmed and (self.config_watch_confirm is None or not self.config_watch_confirm(changes)):
+                self.pending_config = (new, changes)
+                if self.logger:
+                    self.logger.warning("Structural configuration changes are waiting for confirmation.")
+                return changes
+            self.pending_config = None
+            self.initialize(reconcile = True)
+            return changes
+        self.pending_config = None
+        variant = "parameters_for_AXKU041" if self.mode == "AXKU041" else "parameters"
+        touched = []
+        for i in new["instruments"]:
+            instrument = self.instruments[i["slot"]]
+            slot_changes = [change for change in changes if change["target"] == i["slot"]]
+            if not slot_changes:
+                continue
+            if any([change["kind"] == "mapping" for change in slot_changes]):
+                # carry the values of untouched fields over to the new layout
+                moved = [change["name"] for change in slot_changes if change["kind"] == "mapping"]
+                # wide values follow their parts
+                values = instrument.get_parameters([name for name in instrument.mapping if name not in moved and not instrument.mapping[name].get("parts")])
+                # the new layout is built on the registers of the device so that bits outside every field are kept
+                try:
+                    base = instrument.read_control()
+                except Exception:
+                    base = None
+                instrument.mapping = compile_mapping(i["parameters"])[0]
+                instrument.codec = Codec(instrument.mapping)
+                instrument.controls.update(base if base is not None else instrument.controls.copy())
+                defaults = compile_mapping(i[variant] or {})[1]
+                values.update({name:defaults[name] for name in moved if name in instrument.mapping and name in defaults})
+            else:
+                values = {change["name"]:change["desired"] for change in slot_changes}
+            instrument.default_parameters = compile_mapping(i[variant] or {})[1]
+            instrument.set_parameters(values)
+            touched.append(i["slot"])
+        self.config = new
+        self.compile_commands()
+        for slot in touched:
+            # only the registers that differ from the device are written
+            self.upload_control([purpose for purpose in self.purposes if self.purposes[purpose] == slot][0], "control")
+        return changes
+
+    def apply_refresh(self, deltas: dict[int, dict[int, int]]) -> None:
+        # registers with local edits that are not uploaded yet keep the local value
+        for slot, changed in deltas.items():
+            instrument = self.instruments.get(slot)
+            if not isinstance(instrument, MCC) or instrument.device_controls is None:
+                continue
+            device = instrument.device_controls.copy()
+            def write(words: array.array) -> None:
+                for i, value in changed.items():
+                    if words[i] == device[i]:
+                        words[i] = value
+            instrument.controls.modify(write)
+            for i, value in changed.items():
+                instrument.device_controls[i] = value
+
+    def sync_upload(self) -> object:
+        if self.logger:
+            self.logger.info("Synchronizing remote parameters.")
+        for purpose in self.purposes:
+            self.get_instrument(purpose).upload_control(force = True)
+        return self
+    
+    def batch(self, lane: str = "control") -> Batch:
+        return Batch(self, lane)
+
+    def current_batch(self) -> Union[Batch, None]:
+        stack = getattr(self.batches, "stack", [])
+        return stack[-1] if stack else None
+
+    def upload_control(self, purpose: str, lane: str = "control") -> UploadHandle:
+        if self.current_batch() is not None:
+            return self.current_batch().touch(purpose, lane)
+        return self.enqueue(purpose, lane)
+
+    def enqueue(self, purpose: str, lane: str = "control") -> UploadHandle:
+        if self.logger:
+            self.logger.debug("Queued control for %s in %s lane."%(purpose, lane))
+        instrument = self.get_instrument(purpose)
+        with self.uploading_condition:
+            while self.in_flight >= self.max_in_flight:
+                self.uploading_condition.wait()
+            package = Package(instrument, instrument.controls.copy(), lane)
+            if lane != "bulk" and instrument.slot in self.data_mailbox:
+                # the snapshot already holds any value waiting in the mailbox
+                package.absorb(self.data_mailbox.pop(instrument.slot))
+                self.in_flight = self.in_flight - package.count + 1
+                package.count = 1
+                self.upload_statistics["coalesced"] = self.upload_statistics["coalesced"] + 1
+            self.supersede(package)
+            self.uploading_lanes[lane].append(package)
+            self.count_queued(package)
+            self.uploading_condition.notify_all()
+        return package.handles[0]
+
+    def upload_data(self, purpose: str) -> UploadHandle:
+        # the status of the returned handle tells whether the value was queued or replaced a pending one
+        if self.current_batch() is not None:
+            return self.current_batch().touch(purpose)
+        instrument = self.get_instrument(purpose)
+        with self.uploading_condition:
+            package = Package(instrument, instrument.controls.copy(), "data")
+            self.supersede(package)
+            if instrument.slot in self.data_mailbox:
+                if self.logger:
+                    self.logger.debug("Replaced pending data for %s."%purpose)
+                replaced = self.data_mailbox[instrument.slot]
+                package.queued_at = replaced.queued_at
+                package.handles.extend(replaced.handles)
+                package.handles[0].status = "coalesced"
+                self.data_mailbox[instrument.slot] = package
+                self.last_queued[instrument.slot] = package.controls
+                self.upload_statistics["coalesced"] = self.upload_statistics["coalesced"] + 1
+                self.uploading_condition.notify_all()
+                return package.handles[0]
+            if self.logger:
+                self.logger.debug("Queued data for %s."%purpose)
+            self.data_mailbox[instrument.slot] = package
+            self.count_queued(package)
+            self.uploading_condition.notify_all()
+        return package.handles[0]
+
+    def flush(self, timeout: float = None) -> bool:
+        # wait until every queued upload has reached the device or failed
+        with self.uploading_condition:
+            return self.uploading_condition.wait_for(lambda: self.in_flight == 0, timeout)
+
+    def supersede(self, package: Package) -> None:
+        # called with the uploading condition held
+        # older snapshots of the instrument waiting in lower lanes would revert the bits changed by the new one once
+        # it overtakes them, so they are rebased onto it; an emergency drops the bulk ones altogether, the control
+        # and data packages carry operator actions and are only rebased
+        slot = package.instrument.slot
+        if slot not in self.last_queued:
+            return
+        previous = self.last_queued[slot]
+        delta = {i:previous[i] ^ package.controls[i] for i in range(16)}
+        lower = self.LANES[self.LANES.index(package.lane) + 1:] if package.lane in self.LANES else ("bulk",)
+        for lane in lower:
+            for waiting in list(self.uploading_lanes[lane]):
+                if waiting.instrument is not package.instrument:
+                    continue
+                if package.lane == "emergency" and lane == "bulk":
+                    self.uploading_lanes[lane].remove(waiting)
+                    self.in_flight = self.in_flight - waiting.count
+                    self.upload_statistics["superseded"] = self.upload_statistics["superseded"] + waiting.count
+                    self.drop(waiting)
+                else:
+                    waiting.controls = {i:(waiting.controls[i] & ~delta[i]) | (package.controls[i] & delta[i]) for i in range(16)}
+        uploading = self.uploading_package
+        if uploading is not None and uploading.instrument is package.instrument and uploading.lane in lower:
+            # its snapshot is still being written, the same treatment is applied once it is preempted
+            if package.lane == "emergency" and uploading.lane == "bulk":
+                uploading.superseded = True
+            else:
+                uploading.overtaken.append((delta, package.controls))
+        if package.lane == "emergency" and slot in self.data_mailbox:
+            waiting = self.data_mailbox[slot]
+            waiting.controls = {i:(waiting.controls[i] & ~delta[i]) | (package.controls[i] & delta[i]) for i in range(16)}
+
+    def drop(self, package: Package) -> None:
+        for handle in package.handles:
+            handle.resolve(error = Exception("Superseded by an emergency upload."))
+
+    def count_queued(self, package: Package) -> None:
+        # called with the uploading condition held
+        self.last_queued[package.instrument.slot] = package.controls
+        self.in_flight = self.in_flight + 1
+        self.upload_statistics["queued"] = self.upload_statistics["queued"] + 1
+        self.upload_statistics["max_depth"] = max(self.upload_statistics["max_depth"], self.depth())
+
+    def depth(self) -> int:
+        return sum([len(self.uploading_lanes[lane]) for lane in self.LANES]) + len(self.data_mailbox)
+
+    def get_link_statistics(self) -> Union[dict[str, object], None]:
+        # round-trip time and throughput of the pipelined AXKU041 bus
+        if self.link is None:
+            return None
+        return self.link.get_statistics()
+
+    def get_upload_statistics(self) -> dict[str, object]:
+        with self.uploading_condition:
+            statistics = self.upload_statistics.copy()
+            statistics["depth"] = self.depth()
+            statistics["in_flight"] = self.in_flight
+            statistics["lanes"] = {}
+            for lane in self.lane_statistics:
+                uploads = self.lane_statistics[lane]["uploads"]
+                statistics["lanes"][lane] = {
+                    "depth": len(self.data_mailbox) if lane == "data" else len(self.uploading_lanes[lane]),
+                    "uploads": uploads,
+                    "mean_latency": self.lane_statistics[lane]["total_latency"] / uploads if uploads else 0.0,
+                    "max_latency": self.lane_statistics[lane]["max_latency"]
+                }
+        return statistics
+
+    def coalesce(self, package: Package) -> Package:
+        # called with the uploading condition held, absorbs the following snapshots of the same lane into package
+        previous = package.instrument.device_controls
+        if previous is None:
+            return package
+        waiting = self.uploading_lanes[package.lane]
+        while waiting and waiting[0].instrument is package.instrument:
+            following = waiting[0].controls
+            # every bit changed by the current snapshot must survive in the next one, otherwise an edge is lost
+            if any((package.controls[i] ^ previous[i]) & (package.controls[i] ^ following[i]) for i in range(16)):
+                break
+            following = waiting.popleft()
+            package.controls = following.controls
+            package.absorb(following)
+            self.upload_statistics["coalesced"] = self.upload_statistics["coalesced"] + 1
+        return package
+
+    def higher_pending(self) -> bool:
+        # polled without the lock between the register writes of a bulk package
+        return bool(self.uploading_lanes["emergency"] or self.uploading_lanes["control"] or self.data_mailbox)
+
+    def take_data(self) -> Union[Package, float, None]:
+        # called with the uploading condition held, returns a due mailbox package or the time until the next one is due
+        now = time.monotonic()
+        wait = None
+        for slot in list(self.data_mailbox):
+            remaining = self.data_uploaded_at.get(slot, 0) + self.data_upload_interval - now
+            if remaining <= 0:
+                self.data_uploaded_at[slot] = now
+                return self.data_mailbox.pop(slot)
+            if wait is None or remaining < wait:
+                wait = remaining
+        return wait
+
+    def take_package(self) -> Union[Package, float, None]:
+        # called with the uploading condition held, picks the next package by lane priority
+        for lane in ("emergency", "control"):
+            if self.uploading_lanes[lane]:
+                return self.uploading_lanes[lane].popleft()
+        data = self.take_data()
+        if type(data) == Package:
+            return data
+        if self.uploading_lanes["bulk"]:
+            return self.uploading_lanes["bulk"].popleft()
+        return data
+
+    def take_companions(self, package: Package) -> list[Package]:
+        # called with the uploading condition held, collects the earliest package of every other slot
+        # waiting in the same lane so that they share one request
+        companions = []
+        slots = [package.instrument.slot]
+        if package.lane == "data":
+            data = self.take_data()
+            while type(data) == Package:
+                companions.append(data)
+                data = self.take_data()
+            return companions
+        for waiting in list(self.uploading_lanes[package.lane]):
+            if waiting.instrument.slot not in slots:
+                slots.append(waiting.instrument.slot)
+                self.uploading_lanes[package.lane].remove(waiting)
+                companions.append(waiting)
+        return companions
+
+    def uploader_function(self) -> NoReturn:
+        while True:
+            with self.uploading_condition:
+                package = self.take_package()
+                while type(package) != Package:
+                    self.uploading_condition.wait(package)
+                    package = self.take_package()
+                if self.coalescing and package.lane != "data":
+                    package = self.coalesce(package)
+                self.uploading_package = package
+                packages = [package]
+                if self.mode == "http":
+                    packages = packages + self.take_companions(package)
+            if self.logger:
+                self.logger.debug("Uploading control.")
+            try:
+                if len(packages) == 1:
+                    self.upload(package)
+                else:
+                    self.upload_combined(packages)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Upload failed: %s"%e.__repr__())
+                failed = e
+            else:
+                failed = None
+            applied_at = time.time()
+            with self.uploading_condition:
+                self.uploading_package = None
+                if failed is None and package.instrument.upload_interrupted:
+                    self.upload_statistics["preempted"] = self.upload_statistics["preempted"] + 1
+                    if package.superseded:
+                        # resuming would revert the emergency upload
+                        self.in_flight = self.in_flight - package.count
+                        self.upload_statistics["superseded"] = self.upload_statistics["superseded"] + package.count
+                        self.drop(package)
+                        self.uploading_condition.notify_all()
+                    else:
+                        # resume the bulk package once the higher lanes are served, without reverting what overtook it
+                        for delta, controls in package.overtaken:
+                            package.controls = {i:(package.controls[i] & ~delta[i]) | (controls[i] & delta[i]) for i in range(16)}
+                        package.overtaken = []
+                        self.uploading_lanes["bulk"].appendleft(package)
+                    continue
+            for package in packages:
+                self.finish(package, failed, applied_at)
+
+    def finish(self, package: Package, failed: Union[Exception, None], applied_at: float) -> None:
+        for handle in package.handles:
+            handle.resolve(applied_at, failed)
+        with self.uploading_condition:
+            self.in_flight = self.in_flight - package.count
+            if failed is not None:
+                self.upload_statistics["failed"] = self.upload_statistics["failed"] + package.count
+            else:
+                self.upload_statistics["uploaded"] = self.upload_statistics["uploaded"] + package.count
+                latency = time.monotonic() - package.queued_at
+                self.lane_statistics[package.lane]["uploads"] = self.lane_statistics[package.lane]["uploads"] + 1
+                self.lane_statistics[package.lane]["total_latency"] = self.lane_statistics[package.lane]["total_latency"] + latency
+                self.lane_statistics[package.lane]["max_latency"] = max(self.lane_statistics[package.lane]["max_latency"], latency)
+            self.uploading_condition.notify_all()
+
+    def upload_combined(self, packages: list[Package]) -> object:
+        # one request for several slots, only under http mode
+        writes = {package.instrument.slot:package.instrument.pending_writes(package.controls) for package in packages}
+        writes = {slot:registers for slot, registers in writes.items() if registers}
+        try:
+            if writes:
+                self.transport.post_registers(writes)
+        except Exception as e:
+            for package in packages:
+                package.instrument.invalidate_control()
+            raise Exception("Connection error: %s"%e.__repr__())
+        for package in packages:
+            package.instrument.confirm_control(package.controls)
+        return self
+
+    def upload(self, package: Package) -> object:
+        if package.lane == "bulk":
+            package.instrument.upload_control(package.controls, preempt = self.higher_pending)
+        else:
+            package.instrument.upload_control(package.controls)
+        return self
+
+    # intercept all mcc commands
+    def compile_commands(self) -> object:
+        # turn the built-in commands and the <commands> of the configuration into register programs
+        definitions = {}
+        for purpose in self.purposes:
+            fields = self.get_instrument(purpose).mapping
+            for name, definition in self.DEFAULT_COMMANDS.get(purpose, {}).items():
+                if all([step["parameter"] in fields for step in definition["steps"] if "parameter" in step]):
+                    definitions[(purpose, name)] = definition
+        for purpose, commands in self.config["commands"].items():
+            for name, definition in commands.items():
+                definitions[(purpose, name)] = definition
+        self.programs = {(purpose, name):self.compile_command(purpose, name, definition) for (purpose, name), definition in definitions.items()}
+        if self.logger:
+            self.logger.debug("Compiled %d commands."%len(self.programs))
+        return self
+
+    def compile_command(self, purpose: str, name: str, definition: dict[str, object]) -> CommandProgram:
+        # consecutive sets merge into one write per instrument and ride along with the pulses following them,
+        # a set after a pulse or a wait starts the next stage
+        stages = []
+        stage = None
+        for step in definition["steps"]:
+            if stage is None or (step["action"] == "set" and stage["edges"]):
+                stage = {"writes": {}, "edges": {}, "wait": 0.0}
+                stages.append(stage)
+            target = step.get("instrument") or purpose
+            match step["action"]:
+                case "set":
+                    stage["writes"].setdefault(target, {})[step["parameter"]] = step["value"]
+                case "pulse":
+                    stage["edges"].setdefault(target, []).append((step["parameter"], step["active"], step["idle"]))
+                case "wait":
+                    stage["wait"] = stage["wait"] + step["seconds"]
+                    stage = None
+        for stage in stages:
+            stage["writes"] = {target:self.get_instrument(target).codec.masks(values) for target, values in stage["writes"].items()}
+        return CommandProgram(purpose, name, definition["lane"], stages)
+
+    def run_program(self, program: CommandProgram) -> list[UploadHandle]:
+        handles = []
+        for stage in program.stages:
+            with self.batch(program.lane) as batch:
+                for target, (keep, bits) in stage["writes"].items():
+                    self.get_instrument(target).apply_masks(keep, bits)
+                    batch.touch(target)
+                for target, edges in stage["edges"].items():
+                    for name, active, idle in edges:
+                        batch.edge(target, name, active, idle)
+            handles.extend(batch.handles)
+            if stage["wait"]:
+                # inside an outer batch nothing is sent yet, the wait then only delays the caller
+                for handle in batch.handles:
+                    handle.result()
+                time.sleep(stage["wait"])
+        return handles
+
+    def command(self, purpose: str, operation: str) -> object:
+        if self.logger:
+            self.logger.debug("Implementing operation \"%s\" for %s."%(operation, purpose))
+        if purpose not in self.purposes:
+            raise Exception("Unknown purpose.")
+        if (purpose, operation) == ("feedback", "upload_waveform"):
+            return self.upload_waveform()
+        if (purpose, operation) not in self.programs:
+            raise Exception("Unknown operation.")
+        self.run_program(self.programs[(purpose, operation)])
+        return self
+
+    def quantize_waveform(self, samples: np.ndarray) -> list[dict[str, int]]:
+        # samples [[time(s), frequency(Hz)], ...] to the segment words of the feedback design,
+        # bit rates of set_x and set_y come from config.xml
+        codec = self.get_instrument("feedback").codec
+        samples = np.asarray(samples, dtype = float).reshape(-1, 2)
+        if len(samples) > self.WAVEFORM_SEGMENTS:
+            raise Exception("The waveform has %d segments, at most %d fit."%(len(samples), self.WAVEFORM_SEGMENTS))
+        x = codec.to_raw("set_x", samples[:, 0])
+        y = codec.to_raw("set_y", np.abs(samples[:, 1]))
+        sign = (samples[:, 1] < 0).astype(int)
+        slope = y // np.maximum(x, 1)
+        return [{"sign": sign, "x": x, "y": y, "slope": slope} for sign, x, y, slope in zip(sign.tolist(), x.tolist(), y.tolist(), slope.tolist())]
+
+    def stage_waveform(self, samples: np.ndarray) -> concurrent.futures.Future:
+        # quantize the next table in the background, swap_waveform then only has to upload it
+        if self.waveform_executor is None:
+            self.waveform_executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+        self.staged_waveform = self.waveform_executor.submit(self.quantize_waveform, samples)
+        return self.staged_waveform
+
+    def swap_waveform(self, launch: bool = False) -> dict[str, float]:
+        # upload the staged table in place of the current one, only its changed segments go out,
+        # and return once the device accepted it
+        if self.staged_waveform is None:
+            raise Exception("No waveform staged.")
+        waveform = self.staged_waveform.result()
+        self.staged_waveform = None
+        instrument = self.get_instrument("feedback")
+        start = time.monotonic()
+        instrument.waveform = waveform
+        changed, handles = self.write_waveform()
+        if launch:
+            if ("feedback", "launch_frequency_control") not in self.programs:
+                raise Exception("Unknown operation.")
+            handles.extend(self.run_program(self.programs[("feedback", "launch_frequency_control")]))
+        # only this table's uploads are waited for, not the rest of the queue
+        failed = len([handle for handle in handles if handle.cancelled() or handle.exception() is not None])
+        duration = time.monotonic() - start
+        self.waveform_statistics = {"segments": len(waveform), "written": changed, "batches": len(handles), "failed": failed, "duration": duration, "segments_per_second": changed / duration if duration > 0 else 0.0}
+        if failed:
+            raise Exception("%d uploads of the waveform failed."%failed)
+        if self.logger:
+            self.logger.info("Waveform swapped, %d of %d segments written in %.1f ms, %.0f segments/s."%(changed, len(waveform), duration * 1000, self.waveform_statistics["segments_per_second"]))
+        return self.waveform_statistics
+
+    def load_waveform(self, samples: np.ndarray, launch: bool = False) -> dict[str, float]:
+        self.stage_waveform(samples)
+        return self.swap_waveform(launch)
+
+    def load_memory(self, purpose: str, words: np.ndarray, start: int = 0, address: str = "memory_address", data: str = "memory_data", strobe: str = "write_enable", active: int = 1, idle: int = 0, verify: bool = False, force: bool = False) -> object:
+        # streams 64 bit words into the RAM behind a memory port of an instrument from address start on and returns once they landed,
+        # each word is one bulk batch writing only the registers that change, with a single strobe,
+        # addresses still holding the same word since the last load are skipped unless force is set
+        instrument = self.get_instrument(purpose)
+        words = np.asarray(words).astype(np.uint64).ravel()
+        shadow = instrument.memory_shadow.setdefault(data, {})
+        statistics = {"words": len(words), "skipped": 0, "written": 0, "failed": 0, "duration": 0.0}
+        start_time = time.monotonic()
+        handles = []
+        for offset, word in enumerate(words.tolist()):
+            location = start + offset
+            if not force and shadow.get(location) == word:
+                statistics["skipped"] = statistics["skipped"] + 1
+                continue
+            shadow.pop(location, None)
+            with self.batch("bulk") as batch:
+                instrument.set_parameters({address: location, data: word})
+                batch.edge(purpose, strobe, active, idle)
+            for handle in batch.handles:
+                # recorded only once the device accepted the word
+                handle.add_done_callback(lambda handle, location = location, word = word: shadow.__setitem__(location, word) if not handle.cancelled() and handle.exception() is None else None)
+                handles.append((location, handle))
+            if verify:
+                for handle in batch.handles:
+                    handle.exception()
+                readback = instrument.fetch_control()
+                if readback is None:
+                    raise Exception("Registers of slot %d cannot be read back."%instrument.slot)
+                if instrument.codec.get_parameters(readback, [address, data]) != {address: location, data: instrument.codec.get_parameter(instrument.controls.snapshot(), data)}:
+                    shadow.pop(location, None)
+                    raise Exception("Memory write at address %d was not confirmed by readback."%location)
+        failed = [location for location, handle in handles if handle.cancelled() or handle.exception() is not None]
+        statistics["written"] = len(handles) - len(failed)
+        statistics["failed"] = len(failed)
+        statistics["duration"] = time.monotonic() - start_time
+        instrument.memory_statistics = statistics
+        if failed:
+            raise Exception("Memory writes at addresses %s did not land."%", ".join([str(location) for location in failed]))
+        return self
+
+    def upload_waveform(self, force: bool = False) -> object:
+        self.write_waveform(force)
+        return self
+
+    def write_waveform(self, force: bool = False) -> tuple[int, list[UploadHandle]]:
+        # only the segments differing from what the device holds are written, each with one strobe of set,
+        # returns the number of segments written and the handles of these uploads
+        instrument = self.get_instrument("feedback")
+        waveform = [dict(segment) for segment in instrument.waveform]
+        digest = instrument.get_waveform_digest(waveform)
+        if force:
+            instrument.waveform_shadow = []
+            instrument.waveform_digest = None
+        instrument.set_parameter("segments_enabled", len(waveform) - 1)
+        if digest == instrument.waveform_digest:
+            if self.logger:
+                self.logger.debug("Waveform unchanged, skipping the segment upload.")
+            # other edited registers such as prolong still go out
+            return 0, [self.upload_control("feedback", "bulk")]
+        handles = []
+        changed = instrument.get_changed_segments(waveform)
+        instrument.waveform_shadow.extend([None] * (len(waveform) - len(instrument.waveform_shadow)))
+        # set before the writes so that a failing one can clear it
+        instrument.waveform_digest = digest
+        for i in changed:
+            with self.batch("bulk") as batch:
+                instrument.set_parameters({
+                    "set_sign": waveform[i]["sign"],
+                    "set_x": waveform[i]["x"],
+                    "set_y": waveform[i]["y"],
+                    "set_slope": waveform[i]["slope"],
+                    "set_address": i
+                })
+                batch.edge("feedback", "set", 0, 1)
+            instrument.waveform_shadow[i] = waveform[i]
+            for handle in batch.handles:
+                handle.add_done_callback(lambda handle, i = i: instrument.forget_segment(i) if handle.cancelled() or handle.exception() is not None else None)
+            handles.extend(batch.handles)
+        if not changed:
+            handles.append(self.upload_control("feedback", "bulk"))
+        if self.logger:
+            self.logger.debug("Uploaded %d of %d waveform segments."%(len(changed), len(waveform)))
+        return len(changed), handles
+
+    def disconnect(self) -> object:
+        if self.logger:
+            self.logger.info("Disconnecting MIM.")
+        if self.waveform_executor is not None:
+            self.waveform_executor.shutdown(wait = False)
+        if self.mode == "default" or self.mode == "http":
+            self.mim.relinquish_ownership()
+        if self.mode == "http":
+            self.transport.close()
+        elif self.mode == "AXKU041":
+            if self.link is not None:
+                self.link.close()
+            self.serial.close()
+        return self
+    
+    def get_waveform(self, frames: int = 50, delay: float = 0.000) -> list[float]:
+        if self.logger:
+            self.logger.info("Getting waveform from MIM.")
+        result = []
+        for i in range(frames):
+            result = self.osc.get_data()["ch1"] + result
+            time.sleep(delay)
+        return result
+
+def test(mim, N, delay):
+    plt = startup.load("matplotlib.pyplot")
+    fig, ax = plt.subplots()
+    x = np.linspace(0, N, 1024 * N)
+    y = mim.get_waveform(N, delay)
+    ax.plot(x, y)
+    plt.show()
+
+if __name__ == "__main__":
+    mim = MIM("192.168.73.1")
+    mim.initialize()
+    
+    # testing
     test(mim, 100, 0.0005)
\ No newline at end of file
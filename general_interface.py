@@ -1,3 +1,6 @@
+# imported first so that the startup report covers everything after it
+import startup
+
 import tkinter as tk
 import tkinter.ttk as ttk
 
@@ -7,12 +10,11 @@ import time
 import typing
 from typing import NoReturn
 import logging
-import xml.etree.ElementTree as ET
-import requests
 
 import numpy as np
 
 import fpga
+import config_index
 import custom_widgets
 import custom_scripts
 
@@ -80,11 +82,9 @@ class GeneralInterface():
         self.fpga_config_combobox = ttk.Combobox(self.fpga_frame, width = 30)
         self.fpga_config_combobox.place(x = 20, y = 96, anchor = tk.NW)
         self.fpga_config_combobox.bind("<<ComboboxSelected>>", lambda event:self.fpga_config_combobox_onselect())
-        # parse config options
-        self.config_root = ET.parse("config.xml").getroot()
+        # config options come from the compiled configuration index
         self.configs = []
-        for i in self.config_root.findall("./configurations/config"):
-            description = i.get("description")
+        for description in config_index.get_index(self.logger).get_descriptions():
             if len(description) > 35:
                 description = description[:32] + "..."
             self.configs.append(description)
@@ -136,6 +136,8 @@ class GeneralInterface():
         self.update_thread.start()
         self.update()
         self.logger.info("Starting main loop.")
+        # report the import costs once the window is up
+        self.root.after_idle(startup.report, self.logger)
         self.root.mainloop()
         return
 
@@ -271,19 +273,15 @@ class GeneralInterface():
         for i in self.command_buttons:
             i.destroy()
         self.command_buttons = []
-        root = ET.parse("button_config.xml").getroot()
-        for i in root.findall("./configurations/config"):
-            if i.get("id") == self.mim.config_id:
-                for j in i.findall("./buttons/button"):
-                    if j.get("type") == "switch":
-                        button = custom_widgets.ParameterSwitch(self.root, instrument = j.get("instrument"), parameter = j.get("parameter"), mim = self.mim, inverted = eval(j.get("inverted")), text = j.get("text"), width = 32)
-                        button.place(x = 40, y = 254 + 32 * len(self.command_buttons), anchor = tk.NW)
-                        self.command_buttons.append(button)
-                    elif j.get("type") == "script":
-                        button = custom_widgets.ScriptButton(self.root, instrument = j.get("instrument"), mim = self.mim, callback = eval("custom_scripts.%s"%j.get("script")), text = j.get("text"), width = 32)
-                        button.place(x = 40, y = 254 + 32 * len(self.command_buttons), anchor = tk.NW)
-                        self.command_buttons.append(button)
-                break
+        for j in config_index.get_index(self.logger).get_buttons(self.mim.config_id):
+            if j["type"] == "switch":
+                button = custom_widgets.ParameterSwitch(self.root, instrument = j["instrument"], parameter = j["parameter"], mim = self.mim, inverted = j["inverted"], text = j["text"], width = 32)
+                button.place(x = 40, y = 254 + 32 * len(self.command_buttons), anchor = tk.NW)
+                self.command_buttons.append(button)
+            elif j["type"] == "script":
+                button = custom_widgets.ScriptButton(self.root, instrument = j["instrument"], mim = self.mim, callback = eval("custom_scripts.%s"%j["script"]), text = j["text"], width = 32)
+                button.place(x = 40, y = 254 + 32 * len(self.command_buttons), anchor = tk.NW)
+                self.command_buttons.append(button)
         return
 
     def fpga_initialization_button_onclick(self) -> None:
@@ -298,6 +296,10 @@ class GeneralInterface():
         self.logger.info("FPGA initialization thread started.")
         try:
             self.logger.debug("Initializing FPGA.")
+            if self.mim.pending_config is not None:
+                # structural edits of config.xml are applied by initializing again
+                self.mim.parse_config()
+                self.mim.pending_config = None
             self.mim.upload_config()
             self.mim.upload_parameter()
         except Exception as e:
@@ -306,6 +308,8 @@ class GeneralInterface():
         else:
             self.logger.debug("FPGA initialized.")
             self.information["text"] = "FPGA initialized."
+            # edited default values of config.xml are pushed to the running instruments
+            self.mim.start_config_watch()
             for i in self.parameter_controllers:
                 i.refresh()
             for i in self.command_buttons:
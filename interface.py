@@ -1,8 +1,9 @@
+# imported first so that the startup report covers everything after it
+import startup
+
 import tkinter as tk
 import tkinter.ttk as ttk
 
-from PIL import Image, ImageTk
-
 import re
 import hashlib
 import threading
@@ -10,11 +11,11 @@ import time
 import typing
 from typing import NoReturn
 import logging
-import xml.etree.ElementTree as ET
 
 import numpy as np
 
 import fpga
+import config_index
 import tcm
 import custom_widgets
 
@@ -133,8 +134,6 @@ class Interface():
 
         self.setpoint_disconnection_flag = False
 
-        self.knob_uploading_flag = False
-
         self.destroying_flag = False
 
         # other flags
@@ -161,8 +160,8 @@ class Interface():
         
         self.knob_panel_button = ttk.Button(self.root, command = self.knob_panel_button_onclick, width = 2.5)
         self.knob_panel_button.place(relx = 1, rely = 1, x = -25, anchor = tk.SE)
-        self.knob_panel_button.image = ImageTk.PhotoImage(Image.open("icons/knob20.png").resize((17, 17)))
-        self.knob_panel_button.config(image = self.knob_panel_button.image)
+        # the icon needs PIL, it is loaded once the window is shown
+        self.root.after_idle(self.load_icons)
         
         # status panel
         
@@ -220,11 +219,9 @@ class Interface():
 
         self.fpga_config_combobox = ttk.Combobox(self.fpga_frame, width = 30)
         self.fpga_config_combobox.place(x = 20, y = 96, anchor = tk.NW)
-        # parse config options
-        self.config_root = ET.parse("config.xml").getroot()
+        # config options come from the compiled configuration index
         self.configs = []
-        for i in self.config_root.findall("./configurations/config"):
-            description = i.get("description")
+        for description in config_index.get_index(self.logger).get_descriptions():
             if len(description) > 35:
                 description = description[:32] + "..."
             self.configs.append(description)
@@ -278,6 +275,13 @@ class Interface():
         self.tcm_save_button = ttk.Button(self.tcm_frame, text = "Save current temp", command = self.tcm_save_button_onclick, width = 32)
         self.tcm_save_button.place(x = 20, y = 142, anchor = tk.NW)
 
+    def load_icons(self) -> None:
+        Image = startup.load("PIL.Image")
+        ImageTk = startup.load("PIL.ImageTk")
+        self.knob_panel_button.image = ImageTk.PhotoImage(Image.open("icons/knob20.png").resize((17, 17)))
+        self.knob_panel_button.config(image = self.knob_panel_button.image)
+        return
+
     def root_onclose(self) -> None:
         self.logger.info("Closing main window.")
         self.destroying_flag = True
@@ -291,6 +295,8 @@ class Interface():
         self.update_thread.start()
         self.update()
         self.logger.info("Starting main loop.")
+        # report the import costs once the window is up
+        self.root.after_idle(startup.report, self.logger)
         self.root.mainloop()
         return
 
@@ -814,7 +820,7 @@ class Interface():
             self.knob_panel.geometry("800x600")
             self.knob_panel.protocol("WM_DELETE_WINDOW", self.knob_panel_onclose)
 
-            self.manual_offset_knob = custom_widgets.KnobFrame(self.knob_panel, image_path = "icons/knob.png", size = 100, name = "Manual offset", scale = 0.334, unit = "mV")
+            self.manual_offset_knob = custom_widgets.KnobFrame(self.knob_panel, image_path = "icons/knob.png", size = 100, name = "Manual offset", scale = self.mim.get_instrument("turnkey").codec.get_field("manual_offset").scale * 1e3, unit = "mV")
             self.manual_offset_knob.place(x = 10, y = 10, anchor = tk.NW)
             self.manual_offset_knob.knob.set_value(self.mim.get_instrument("turnkey").get_parameter("manual_offset"))
             self.manual_offset_knob.knob.on_spin = self.manual_offset_knob_onspin
@@ -841,22 +847,13 @@ class Interface():
             self.logger.debug("Setting manual offset to %d."%self.manual_offset_knob.knob.get_value())
             self.manual_offset_knob.update()
             self.mim.get_instrument("turnkey").set_parameter("manual_offset", self.manual_offset_knob.knob.get_value())
-            if self.knob_uploading_flag == False:
-                self.knob_uploading_flag = True
-                self.knob_uploading_thread = threading.Thread(target = self.knob_uploading_thread_function, args = (), daemon = True)
-                self.knob_uploading_thread.start()
+            # the mailbox keeps only the latest value, so every step can be posted without blocking
+            self.mim.upload_data("turnkey")
         except Exception as e:
             self.logger.error("%s"%e.__repr__())
             self.information["text"] = "Error encountered when setting manual offset: %s"%e.__repr__()
         return
 
-    def knob_uploading_thread_function(self) -> None:
-        self.logger.info("Knob uploading thread started.")
-        self.mim.upload_control("turnkey")
-        self.knob_uploading_flag = False
-        self.logger.debug("Knob parameter uploaded.")
-        return
-
     def command_soliton_button_onclick(self) -> None:
         self.logger.info("Soliton button clicked.")
         if self.mim.get_instrument("turnkey") is None:
@@ -1200,6 +1197,8 @@ class Interface():
         else:
             self.logger.debug("FPGA initialized.")
             self.information["text"] = "FPGA initialized."
+            # edited default values of config.xml are pushed to the running instruments
+            self.mim.start_config_watch()
         finally:
             self.fpga_state = self.FPGA_STATE_STANDBY
         return
@@ -1212,21 +1211,19 @@ class Interface():
             return
         self.mim.get_instrument("turnkey").set_parameter("manual_offset", self.manual_offset_value2control(self.manual_offset_entry.get_value()))
         result = self.mim.upload_data("turnkey")
-        match result:
+        match result.status:
             case "queued":
                 self.logger.debug("Parameter queued.")
-            case "rejected":
-                self.logger.debug("Parameter rejected.")
+            case "coalesced":
+                self.logger.debug("Parameter replaced a pending value.")
         return
     
     def manual_offset_control2quantity(self, control: int) -> str:
-        if control < 32767:
-            return "%.3fV"%(control * 0.33417 * 1e-3)
-        else:
-            return "%.3fV"%((control - 65536) * 0.33417 * 1e-3)
+        # scale and sign of manual_offset come from config.xml
+        return "%.3fV"%self.mim.get_instrument("turnkey").codec.from_raw("manual_offset", control)
 
     def manual_offset_value2control(self, value: float) -> int:
-        return int(np.round(value / 0.33417 * 1e3))
+        return int(self.mim.get_instrument("turnkey").codec.to_raw("manual_offset", value))
 
     def fpga_control_panel_button_onclick(self) -> None:
         self.logger.info("FPGA control panel button clicked.")
@@ -1303,18 +1300,18 @@ class Interface():
             return
         self.mim.get_instrument("feedback").set_parameter("frequency_bias", self.frequency_bias_value2control(self.frequency_bias_entry.get_value()))
         result = self.mim.upload_data("feedback")
-        match result:
+        match result.status:
             case "queued":
                 self.logger.debug("Parameter queued.")
-            case "rejected":
-                self.logger.debug("Parameter rejected.")
+            case "coalesced":
+                self.logger.debug("Parameter replaced a pending value.")
         return
     
     def frequency_bias_control2quantity(self, control: int) -> str:
-        return "%.3fMHz"%(control * 298.023 * 1e-6)
+        return "%.3fMHz"%(self.mim.get_instrument("feedback").codec.from_raw("frequency_bias", control) * 1e-6)
 
     def frequency_bias_value2control(self, value: float) -> int:
-        return int(np.round(value / 298.023))
+        return int(self.mim.get_instrument("feedback").codec.to_raw("frequency_bias", value))
 
     def LO_button_onclick(self) -> None:
         self.logger.info("Local oscillator button clicked.")
@@ -1448,13 +1445,7 @@ class Interface():
 
     def upload_waveform(self, waveform: list[list[float]], periodic: bool, prolong: bool) -> None:
         # waveform [[time(s), frequency(Hz)], ...]
-        # bit rate: 3.2ns/bit & 298.023Hz/bit
-        converted = [{
-                        "sign": 1 if waveform[i][1] < 0 else 0,
-                        "x": int(np.round(waveform[i][0] * 312.5e6)),
-                        "y": int(np.round(np.abs(waveform[i][1] / 298.023))),
-                        "slope": int(np.floor(np.round(np.abs(waveform[i][1] / 298.023)) / np.round(waveform[i][0] * 312.5e6)))
-                    } for i in range(len(waveform))]
+        converted = self.mim.quantize_waveform(waveform)
         self.logger.info("Uploading waveform : %s."%converted)
         self.mim.get_instrument("feedback").waveform = converted
         self.frequency_control_periodic_next = 0 if periodic else 1
@@ -0,0 +1,110 @@
+import threading
+import time
+import concurrent.futures
+from typing import NoReturn
+
+class PipelinedBus():
+    # Keeps up to window requests outstanding on a link instead of waiting for every reply.
+    # send(tag, request) puts one tagged request frame on the wire,
+    # receive() blocks for the next tagged reply and returns (tag, reply), or None when its own timeout expires.
+    # Replies may come back in any order, they are matched to their requests by tag.
+    def __init__(self, send: callable, receive: callable, window: int = 8, timeout: float = 0.5, tags: int = 256, logger = None):
+        self.send = send
+        self.receive = receive
+        self.window = window
+        self.timeout = timeout
+        self.tags = tags
+        self.logger = logger
+
+        self.next_tag = 0
+        # tag -> (future, sent_at)
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.sending_lock = threading.Lock()
+
+        self.statistics = {"requests": 0, "replies": 0, "timeouts": 0, "stray": 0, "total_rtt": 0.0, "min_rtt": None, "max_rtt": 0.0, "last_rtt": None}
+        self.started_at = time.monotonic()
+
+        self.closing_flag = False
+        self.reader = threading.Thread(target = self.reader_function, args = (), daemon = True)
+        self.reader.start()
+
+    def submit(self, request: object) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self.condition:
+            while len(self.pending) >= self.window or self.next_tag in self.pending:
+                self.condition.wait()
+            tag = self.next_tag
+            self.next_tag = (self.next_tag + 1) % self.tags
+            self.pending[tag] = (future, time.monotonic())
+            self.statistics["requests"] = self.statistics["requests"] + 1
+        try:
+            # requests leave in submission order
+            with self.sending_lock:
+                self.send(tag, request)
+        except Exception as e:
+            with self.condition:
+                del self.pending[tag]
+                self.condition.notify_all()
+            future.set_exception(e)
+        return future
+
+    def call(self, request: object) -> object:
+        return self.submit(request).result()
+
+    def drain(self) -> object:
+        # wait until no request is outstanding
+        with self.condition:
+            while self.pending:
+                self.condition.wait()
+        return self
+
+    def reader_function(self) -> NoReturn:
+        while not self.closing_flag:
+            try:
+                reply = self.receive()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Pipelined bus receive failed: %s"%e.__repr__())
+                reply = None
+            now = time.monotonic()
+            resolved = []
+            with self.condition:
+                if reply is not None:
+                    tag, data = reply
+                    if tag in self.pending:
+                        future, sent_at = self.pending.pop(tag)
+                        rtt = now - sent_at
+                        self.statistics["replies"] = self.statistics["replies"] + 1
+                        self.statistics["total_rtt"] = self.statistics["total_rtt"] + rtt
+                        self.statistics["last_rtt"] = rtt
+                        self.statistics["max_rtt"] = max(self.statistics["max_rtt"], rtt)
+                        if self.statistics["min_rtt"] is None or rtt < self.statistics["min_rtt"]:
+                            self.statistics["min_rtt"] = rtt
+                        resolved.append((future, data, None))
+                    else:
+                        self.statistics["stray"] = self.statistics["stray"] + 1
+                for tag in [tag for tag in self.pending if now - self.pending[tag][1] > self.timeout]:
+                    future, sent_at = self.pending.pop(tag)
+                    self.statistics["timeouts"] = self.statistics["timeouts"] + 1
+                    resolved.append((future, None, TimeoutError("No reply to request %d."%tag)))
+                if resolved:
+                    self.condition.notify_all()
+            for future, data, error in resolved:
+                if error is None:
+                    future.set_result(data)
+                else:
+                    future.set_exception(error)
+
+    def get_statistics(self) -> dict[str, object]:
+        with self.condition:
+            statistics = self.statistics.copy()
+            statistics["outstanding"] = len(self.pending)
+        elapsed = time.monotonic() - self.started_at
+        statistics["mean_rtt"] = statistics["total_rtt"] / statistics["replies"] if statistics["replies"] else None
+        statistics["throughput"] = statistics["replies"] / elapsed if elapsed > 0 else 0.0
+        return statistics
+
+    def close(self) -> object:
+        self.closing_flag = True
+        return self
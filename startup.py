@@ -0,0 +1,57 @@
+import builtins
+import importlib
+import sys
+import threading
+import time
+
+# reference point of the startup report, the entry points import this module first
+started_at = time.perf_counter()
+# module name -> seconds spent importing it, through load or an import statement
+import_timing = {}
+import_lock = threading.Lock()
+# depth of the timed import running in the current thread, the modules it pulls in are counted with it
+import_state = threading.local()
+original_import = builtins.__import__
+
+def timed_import(name: str, globals: dict = None, locals: dict = None, fromlist: tuple = (), level: int = 0) -> object:
+    # stands in for __import__ until the report, so the import statements of the entry points are timed as well
+    if level or name in sys.modules or getattr(import_state, "depth", 0):
+        return original_import(name, globals, locals, fromlist, level)
+    import_state.depth = 1
+    start = time.perf_counter()
+    try:
+        module = original_import(name, globals, locals, fromlist, level)
+    finally:
+        import_state.depth = 0
+    import_timing.setdefault(name, time.perf_counter() - start)
+    return module
+
+builtins.__import__ = timed_import
+
+def load(name: str) -> object:
+    # import a module when it is first needed and record what it cost
+    if name in sys.modules:
+        return sys.modules[name]
+    with import_lock:
+        start = time.perf_counter()
+        depth = getattr(import_state, "depth", 0)
+        import_state.depth = depth + 1
+        try:
+            module = importlib.import_module(name)
+        finally:
+            import_state.depth = depth
+        if name not in import_timing:
+            import_timing[name] = time.perf_counter() - start
+    return module
+
+def report(logger = None) -> list[str]:
+    # import costs from the most expensive one, followed by the time since startup
+    # the window is up by now, later import statements are no longer timed
+    if builtins.__import__ is timed_import:
+        builtins.__import__ = original_import
+    lines = ["%-32s %8.1f ms"%(name, duration * 1000) for name, duration in sorted(import_timing.items(), key = lambda item: -item[1])]
+    lines.append("%-32s %8.1f ms"%("since startup", (time.perf_counter() - started_at) * 1000))
+    if logger:
+        for line in lines:
+            logger.info("Startup: %s"%line)
+    return lines